@@ -0,0 +1,125 @@
+import sys
+import numpy as np
+from CompiledCollection import CompiledCollection
+
+
+class BatchResult:
+    """Per-battle outcomes of a BatchEngine run, one array entry per battle."""
+
+    def __init__(
+        self, attacker: CompiledCollection, defender: CompiledCollection, attackerIndex, defenderIndex, rounds, retreated, stalemate
+    ):
+        self.attackerHP = attacker.hp[attackerIndex]
+        self.defenderHP = defender.hp[defenderIndex]
+        self.attackerValueDelta = attacker.cost[attackerIndex] - attacker.cost[0]
+        self.defenderValueDelta = defender.cost[defenderIndex] - defender.cost[0]
+        self.ipcSwing = self.attackerValueDelta - self.defenderValueDelta
+        self.rounds = rounds
+        self.retreated = retreated
+        # The battle ended because neither side could score a hit
+        self.stalemate = stalemate
+
+    def __len__(self):
+        return len(self.attackerHP)
+
+    def toDataFrame(self):
+        """Results in the same layout GenerateBattleStats builds from individual battles."""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "Attacker Won": (self.attackerHP > self.defenderHP).astype(int),
+                "Remainder Attacker": self.attackerHP,
+                "Remainder Defender": self.defenderHP,
+                "Average IPC Swing (Attacker)": self.ipcSwing,
+            }
+        )
+
+
+class BatchEngine:
+    """Monte Carlo engine that fights many battles between the same two collections in lockstep.
+
+    Each battle's state is a pair of casualty indices into the compiled collections, so a
+    round is a handful of array operations over every active battle: the dice of all
+    battles are rolled with one binomial draw per side and hits advance the casualty
+    indices along the loss priority. Battles that end are dropped from the active set, including
+    stalemates where neither side has a die that can score a hit (see BattleEngine._fight)."""
+
+    def __init__(self, retreatThreshold=0, maxRounds=-1, seed=None):
+        self.retreatThreshold = retreatThreshold
+        self.maxRounds = sys.maxsize if maxRounds < 0 else maxRounds
+        self.rng = np.random.default_rng(seed)
+
+    def run(self, attacker: CompiledCollection, defender: CompiledCollection, battleCount: int):
+        attacker.checkTargets(defender)
+        defender.checkTargets(attacker)
+        attackerIndex = np.zeros(battleCount, dtype=np.int64)
+        defenderIndex = np.zeros(battleCount, dtype=np.int64)
+        rounds = np.zeros(battleCount, dtype=np.int64)
+        retreated = np.zeros(battleCount, dtype=bool)
+        stalemate = np.zeros(battleCount, dtype=bool)
+
+        active = np.arange(battleCount)
+        if attacker.hp[0] == 0 or defender.hp[0] == 0:
+            active = active[:0]
+        round = 0
+        while active.size > 0 and round < self.maxRounds:
+            round += 1
+            a = attackerIndex[active]
+            d = defenderIndex[active]
+
+            # First Strike Phase
+            attackerHits, attackerGeneral = self._firstStrike(attacker, defender, a, d, True)
+            defenderHits, defenderGeneral = self._firstStrike(defender, attacker, d, a, False)
+            a = np.minimum(a + defenderHits, attacker.maxIndex)
+            d = np.minimum(d + attackerHits, defender.maxIndex)
+
+            # General Combat Phase
+            attackerHits = self._roll(attacker.attackDice[a] + attackerGeneral(a), attacker.probs)
+            defenderHits = self._roll(defender.defenseDice[d] + defenderGeneral(d), defender.probs)
+            a = np.minimum(a + defenderHits, attacker.maxIndex)
+            d = np.minimum(d + attackerHits, defender.maxIndex)
+
+            attackerIndex[active] = a
+            defenderIndex[active] = d
+            rounds[active] = round
+
+            attackerHP = attacker.hp[a]
+            defenderHP = defender.hp[d]
+            fighting = (attackerHP > 0) & (defenderHP > 0)
+            stuck = fighting & (attacker.attackHitDice[a] == 0) & (defender.defenseHitDice[d] == 0)
+            stalemate[active] = stuck
+            retreat = attackerHP <= self.retreatThreshold
+            retreated[active] = retreat & fighting
+            finished = ~fighting | retreat | stuck
+            active = active[~finished]
+
+        return BatchResult(attacker, defender, attackerIndex, defenderIndex, rounds, retreated, stalemate)
+
+    def _roll(self, dice: np.ndarray, probs: np.ndarray):
+        """Roll every battle's dice at once. dice has one row per battle and one column per hit probability."""
+        if dice.shape[1] == 0:
+            return np.zeros(dice.shape[0], dtype=np.int64)
+        return self.rng.binomial(dice, probs).sum(axis=1)
+
+    def _firstStrike(self, side: CompiledCollection, opponent: CompiledCollection, s, o, isAttack: bool):
+        """Roll the first strike dice of one side. Returns the hits and a function giving the
+        first strike dice that still have to be rolled in the general combat phase (i.e., the
+        units that were countered)."""
+        hits = np.zeros(s.shape[0], dtype=np.int64)
+        counteredGroups = []
+        for group in side.firstStrikeGroups:
+            countered = np.zeros(s.shape[0], dtype=bool)
+            for counter in group.counters:
+                countered |= opponent.hasInstance(counter)[o]
+            groupDice = group.attackDice if isAttack else group.defenseDice
+            hits += self._roll(groupDice[s] * ~countered[:, None], side.probs)
+            counteredGroups.append((groupDice, countered))
+
+        def generalDice(index):
+            dice = np.zeros((index.shape[0], side.probs.shape[0]), dtype=np.int64)
+            for groupDice, countered in counteredGroups:
+                dice += groupDice[index] * countered[:, None]
+            return dice
+
+        return hits, generalDice
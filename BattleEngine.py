@@ -0,0 +1,240 @@
+import sys
+from CasualtyPolicy import CasualtyPolicy, LossPriorityPolicy
+from Dice import DiceRoller
+from Hit import HitCounts
+import Profiling
+from Profiling import BattleProfiler
+from UnitCollection import UnitCollection
+
+
+class BattleResult:
+    """Outcome of a single battle fought by the BattleEngine."""
+
+    def __init__(
+        self,
+        attacker: UnitCollection,
+        defender: UnitCollection,
+        rounds: int,
+        retreated: bool,
+        roundStats: list = None,
+        stalemate: bool = False,
+    ):
+        self.attackerHP = attacker.currHP()
+        self.defenderHP = defender.currHP()
+        self.attackerValueDelta = attacker.valueDelta()
+        self.defenderValueDelta = defender.valueDelta()
+        self.ipcSwing = self.attackerValueDelta - self.defenderValueDelta
+        self.rounds = rounds
+        self.retreated = retreated
+        # The battle ended because neither side could hit the other
+        self.stalemate = stalemate
+        self.roundStats = roundStats if roundStats is not None else []
+
+    @property
+    def attackerWon(self):
+        """Same rule as the battle stats (see BattleStats.add): the attacker ended with more HP."""
+        return self.attackerHP > self.defenderHP
+
+    def __str__(self):
+        return (
+            f"Attacker HP: {self.attackerHP}, Defender HP: {self.defenderHP}, "
+            f"Rounds: {self.rounds}, Retreated: {self.retreated}, Stalemate: {self.stalemate}, IPC Swing: {self.ipcSwing}"
+        )
+
+
+class BattlePolicy:
+    """Decisions the engine defers to while a battle is fought.
+
+    The default policy leaves casualties to its casualty policy (by default, each collection's
+    loss priority), never retreats early and ignores the progress notifications. Subclasses
+    override the hooks they care about (e.g., the interactive simulator prompts and prints from them)."""
+
+    # Called with the dice rolled in the battle (see CombatUnit._rollHits), None to roll quietly
+    rollObserver = None
+
+    def __init__(self, casualtyPolicy: CasualtyPolicy = None):
+        self.casualtyPolicy = LossPriorityPolicy() if casualtyPolicy is None else casualtyPolicy
+
+    def chooseCasualties(self, victim: UnitCollection, aggressor: UnitCollection, hits: HitCounts, side: str):
+        """Decide which casualties the victim takes from the given hits. The return value
+        is handed back to applyCasualties once both sides have rolled."""
+        return self.casualtyPolicy.choose(victim, aggressor, hits, side)
+
+    def applyCasualties(self, victim: UnitCollection, casualties):
+        self.casualtyPolicy.apply(victim, casualties)
+
+    def pressAttack(self, round: int, attacker: UnitCollection, defender: UnitCollection):
+        """Return False to have the attacker retreat after the given round."""
+        return True
+
+    def roundStarted(self, round: int):
+        pass
+
+    def phaseStarted(self, round: int, side: str, isFirstStrike: bool):
+        pass
+
+    def phaseFinished(self, round: int, side: str, isFirstStrike: bool, hitCount: int):
+        pass
+
+    def roundFinished(self, round: int, attacker: UnitCollection, defender: UnitCollection, attackerHitCount: int, defenderHitCount: int):
+        pass
+
+
+class BattleEngine:
+    """Fights battles between two unit collections without any terminal or UI side effects.
+    All dice are rolled from the engine's DiceRoller, so an engine created with a seeded
+    roller fights the same battles on every run. With a profiler, the time spent in each
+    phase of every battle is recorded in it. Battles run without a BattlePolicy take their
+    casualties following the engine's casualty policy."""
+
+    def __init__(
+        self,
+        retreatThreshold=0,
+        maxRounds=-1,
+        recordRounds=False,
+        rng: DiceRoller = None,
+        profiler: BattleProfiler = None,
+        casualtyPolicy: CasualtyPolicy = None,
+    ):
+        self.retreatThreshold = retreatThreshold
+        self.maxRounds = sys.maxsize if maxRounds < 0 else maxRounds
+        self.recordRounds = recordRounds
+        self.rng = DiceRoller() if rng is None else rng
+        self.profiler = profiler
+        self.casualtyPolicy = LossPriorityPolicy() if casualtyPolicy is None else casualtyPolicy
+
+    def run(self, attacker: UnitCollection, defender: UnitCollection, policy: BattlePolicy = None):
+        """Fight a single battle from the collections' original state and return a BattleResult.
+        The collections are left in their end-of-battle state."""
+        policy = BattlePolicy(self.casualtyPolicy) if policy is None else policy
+        if self.profiler is None:
+            return self._fight(attacker, defender, policy)
+        previous = Profiling.active
+        Profiling.active = self.profiler
+        self.profiler.startBattle()
+        try:
+            return self._fight(attacker, defender, policy)
+        finally:
+            Profiling.active = previous
+
+    def _fight(self, attacker: UnitCollection, defender: UnitCollection, policy: BattlePolicy):
+        phase = Profiling.phase
+        with phase("Reset"):
+            attacker.reset()
+            defender.reset()
+        round = 0
+        retreat = False
+        stalemate = False
+        roundStats = []
+        if self.recordRounds:
+            roundStats.append(self._getRoundStats(round, attacker, defender, 0, 0))
+
+        while (
+            attacker.currHP() > 0
+            and defender.currHP() > 0
+            and not retreat
+            and not stalemate
+            and round < self.maxRounds
+        ):
+            round += 1
+            hpBefore = (attacker.currHP(), defender.currHP())
+            if self.profiler is not None:
+                self.profiler.startRound(round)
+            policy.roundStarted(round)
+            if self.recordRounds:
+                attackerExpected = attacker.expectedHits(True)
+                defenderExpected = defender.expectedHits(False)
+            attackerHitCount, defenderHitCount = (0, 0)
+
+            # First Strike Phase
+            with phase("First Strike Check"):
+                attackerFirstStrike = attacker.CanFirstStrike(defender)
+                defenderFirstStrike = defender.CanFirstStrike(attacker)
+            if attackerFirstStrike:
+                policy.phaseStarted(round, "Attacker", True)
+                with phase("First Strike Rolls"):
+                    attackerHits = attacker.firstStrikeAttack(defender, policy.rollObserver, self.rng)
+                attackerHitCount += len(attackerHits)
+                with phase("Choose Casualties"):
+                    defenderCasualties = policy.chooseCasualties(defender, attacker, attackerHits, "Defender")
+                policy.phaseFinished(round, "Attacker", True, len(attackerHits))
+            if defenderFirstStrike:
+                policy.phaseStarted(round, "Defender", True)
+                with phase("First Strike Rolls"):
+                    defenderHits = defender.firstStrikeDefend(attacker, policy.rollObserver, self.rng)
+                defenderHitCount += len(defenderHits)
+                with phase("Choose Casualties"):
+                    attackerCasualties = policy.chooseCasualties(attacker, defender, defenderHits, "Attacker")
+                policy.phaseFinished(round, "Defender", True, len(defenderHits))
+            if attackerFirstStrike or defenderFirstStrike:
+                with phase("Apply Casualties"):
+                    if attackerFirstStrike:
+                        policy.applyCasualties(defender, defenderCasualties)
+                    if defenderFirstStrike:
+                        policy.applyCasualties(attacker, attackerCasualties)
+
+            # General Combat Phase
+            policy.phaseStarted(round, "Attacker", False)
+            with phase("Rolls"):
+                attackerHits = attacker.attack(policy.rollObserver, self.rng)
+            attackerHitCount += len(attackerHits)
+            with phase("Choose Casualties"):
+                defenderCasualties = policy.chooseCasualties(defender, attacker, attackerHits, "Defender")
+            policy.phaseFinished(round, "Attacker", False, attackerHitCount)
+
+            policy.phaseStarted(round, "Defender", False)
+            with phase("Rolls"):
+                defenderHits = defender.defend(policy.rollObserver, self.rng)
+            defenderHitCount += len(defenderHits)
+            with phase("Choose Casualties"):
+                attackerCasualties = policy.chooseCasualties(attacker, defender, defenderHits, "Attacker")
+            policy.phaseFinished(round, "Defender", False, defenderHitCount)
+
+            with phase("Apply Casualties"):
+                policy.applyCasualties(attacker, attackerCasualties)
+                policy.applyCasualties(defender, defenderCasualties)
+            Profiling.count("Attacker Hits", attackerHitCount)
+            Profiling.count("Defender Hits", defenderHitCount)
+
+            if self.recordRounds:
+                roundStats.append(
+                    self._getRoundStats(round, attacker, defender, attackerHitCount, defenderHitCount, attackerExpected, defenderExpected)
+                )
+
+            # A round without losses may mean neither side can hit the other (e.g., submarines vs. air
+            # units without a destroyer), then the battle would never end
+            if (attacker.currHP(), defender.currHP()) == hpBefore and attacker.currHP() > 0 and defender.currHP() > 0:
+                stalemate = not attacker.canHit(defender, True) and not defender.canHit(attacker, False)
+
+            retreat = attacker.currHP() <= self.retreatThreshold
+            policy.roundFinished(round, attacker, defender, attackerHitCount, defenderHitCount)
+            if not retreat and not stalemate and attacker.currHP() > 0 and defender.currHP() > 0:
+                retreat = not policy.pressAttack(round, attacker, defender)
+
+        return BattleResult(attacker, defender, round, retreat, roundStats, stalemate)
+
+    def _getRoundStats(
+        self,
+        round: int,
+        attacker: UnitCollection,
+        defender: UnitCollection,
+        attackerHitCount: int,
+        defenderHitCount: int,
+        attackerExpectedHits: float = None,
+        defenderExpectedHits: float = None,
+    ):
+        if attackerExpectedHits is None:
+            attackerExpectedHits = attacker.expectedHits(True)
+        if defenderExpectedHits is None:
+            defenderExpectedHits = defender.expectedHits(False)
+        return [
+            round,
+            attacker.currHP(),
+            attacker.currCost(),
+            attackerExpectedHits,
+            attackerHitCount,
+            defender.currHP(),
+            defender.currCost(),
+            defenderExpectedHits,
+            defenderHitCount,
+        ]
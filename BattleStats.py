@@ -0,0 +1,223 @@
+from statistics import NormalDist
+import numpy as np
+from BattleEngine import BattleResult
+
+
+class BattleStats:
+    """Running totals of battle outcomes, grouped by whether the attacker won (i.e., ended the
+    battle with more HP than the defender). Stats of separately fought batches of battles can be
+    merged, so battles can be split over several processes."""
+
+    columns = ["Remainder Attacker", "Remainder Defender", "Average IPC Swing (Attacker)"]
+
+    def __init__(self):
+        self.battleCount = 0
+        self._counts = [0, 0]
+        self._sums = [[0] * len(BattleStats.columns) for attackerWon in (0, 1)]
+        # For the variance of the IPC swing
+        self._ipcSwingSquares = 0
+
+    def add(self, result: BattleResult):
+        attackerWon = 1 if result.attackerWon else 0
+        self.battleCount += 1
+        self._counts[attackerWon] += 1
+        sums = self._sums[attackerWon]
+        sums[0] += result.attackerHP
+        sums[1] += result.defenderHP
+        sums[2] += result.ipcSwing
+        self._ipcSwingSquares += result.ipcSwing**2
+
+    def merge(self, other: "BattleStats"):
+        self.battleCount += other.battleCount
+        for attackerWon in (0, 1):
+            self._counts[attackerWon] += other._counts[attackerWon]
+            self._sums[attackerWon] = [a + b for a, b in zip(self._sums[attackerWon], other._sums[attackerWon])]
+        self._ipcSwingSquares += other._ipcSwingSquares
+
+    def toDict(self):
+        """Totals of the stats as plain JSON-serializable values (see fromDict)."""
+        return {"battleCount": self.battleCount, "counts": self._counts, "sums": self._sums, "ipcSwingSquares": self._ipcSwingSquares}
+
+    def fromDict(values: dict):
+        stats = BattleStats()
+        stats.battleCount = values["battleCount"]
+        stats._counts = list(values["counts"])
+        stats._sums = [list(sums) for sums in values["sums"]]
+        stats._ipcSwingSquares = values["ipcSwingSquares"]
+        return stats
+
+    @property
+    def attackerWinRate(self):
+        return self._counts[1] / self.battleCount if self.battleCount > 0 else 0.0
+
+    @property
+    def ipcSwing(self):
+        """Mean IPC swing (attacker) over all battles."""
+        total = self._sums[0][2] + self._sums[1][2]
+        return total / self.battleCount if self.battleCount > 0 else 0.0
+
+    def winRateInterval(self, confidence=0.95):
+        """(low, high) confidence interval of the attacker win rate (Wilson score interval, which stays
+        meaningful for lopsided battles that are always won or always lost)."""
+        n = self.battleCount
+        if n == 0:
+            return (0.0, 1.0)
+        z = _zScore(confidence)
+        p = self.attackerWinRate
+        center = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+        halfWidth = z / (1 + z**2 / n) * (p * (1 - p) / n + z**2 / (4 * n**2)) ** 0.5
+        return (center - halfWidth, center + halfWidth)
+
+    def ipcSwingInterval(self, confidence=0.95):
+        """(low, high) confidence interval of the mean IPC swing (normal approximation)."""
+        n = self.battleCount
+        if n < 2:
+            return (-float("inf"), float("inf"))
+        mean = self.ipcSwing
+        variance = max(self._ipcSwingSquares - n * mean**2, 0) / (n - 1)
+        halfWidth = _zScore(confidence) * (variance / n) ** 0.5
+        return (mean - halfWidth, mean + halfWidth)
+
+    def summary(self):
+        """Win rate and mean outcomes over all battles."""
+        rv = {"Battles": self.battleCount, "Attacker Win Rate": self.attackerWinRate}
+        for i, column in enumerate(BattleStats.columns):
+            total = self._sums[0][i] + self._sums[1][i]
+            rv[column] = total / self.battleCount if self.battleCount > 0 else 0.0
+        return rv
+
+    def toDataFrame(self):
+        """Mean outcomes by "Attacker Won", like grouping GenerateBattleStats' per-battle results."""
+        import pandas as pd
+
+        rows = {}
+        for attackerWon in (0, 1):
+            count = self._counts[attackerWon]
+            if count > 0:
+                rows[attackerWon] = [total / count for total in self._sums[attackerWon]]
+        df = pd.DataFrame.from_dict(rows, orient="index", columns=BattleStats.columns)
+        df.index.name = "Attacker Won"
+        return df
+
+
+def _zScore(confidence):
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+class PrecisionTarget:
+    """When to stop an adaptive run (see ParallelBattles.runUntilPrecise): once the confidence intervals
+    of the attacker win rate and the mean IPC swing are at most ±winRate (e.g., 0.005 = ±0.5%) and
+    ±ipcSwing IPCs wide. A precision of None isn't checked."""
+
+    def __init__(self, winRate=0.005, ipcSwing=0.5, confidence=0.95):
+        self.winRate = winRate
+        self.ipcSwing = ipcSwing
+        self.confidence = confidence
+
+    def isMet(self, stats: BattleStats):
+        if self.winRate is not None:
+            low, high = stats.winRateInterval(self.confidence)
+            if (high - low) / 2 > self.winRate:
+                return False
+        if self.ipcSwing is not None:
+            low, high = stats.ipcSwingInterval(self.confidence)
+            if (high - low) / 2 > self.ipcSwing:
+                return False
+        return True
+
+
+class RunningStats:
+    """Count, mean and variance of a stream of value vectors, updated one vector at a time (Welford's
+    algorithm), so no values are kept. Accumulators of separate streams can be merged."""
+
+    __slots__ = ("count", "total", "_mean", "m2")
+
+    def __init__(self, width: int):
+        self.count = 0
+        # The reported mean is total / count, like pandas computes it; _mean is Welford's running mean
+        self.total = np.zeros(width)
+        self._mean = np.zeros(width)
+        # Sum of squared differences from the mean
+        self.m2 = np.zeros(width)
+
+    def add(self, values):
+        self.count += 1
+        self.total += values
+        delta = values - self._mean
+        self._mean += delta / self.count
+        self.m2 += delta * (values - self._mean)
+
+    def merge(self, other: "RunningStats"):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self.total = self.total + other.total
+        self._mean = self._mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + delta**2 * (self.count * other.count / count)
+        self.count = count
+
+    def mean(self):
+        return self.total / self.count
+
+    def std(self):
+        """Sample standard deviation (NaN with less than two values)."""
+        if self.count < 2:
+            return np.full(len(self.total), np.nan)
+        return np.sqrt(self.m2 / (self.count - 1))
+
+
+class RoundStats:
+    """Per-round state of every battle fought (see BattleEngine's recordRounds), aggregated by round and
+    by (number of rounds the battle lasted, round) as the battles finish. Only running totals are kept,
+    so memory doesn't grow with the number of battles."""
+
+    columns = [
+        "Attacker HP",
+        "Attacker TUV",
+        "Attacker Expected Hits",
+        "Attacker Actual Hits",
+        "Defender HP",
+        "Defender TUV",
+        "Defender Expected Hits",
+        "Defender Actual Hits",
+    ]
+
+    def __init__(self):
+        self.byRound = {}
+        self.byMaxRound = {}
+
+    def _stats(self, groups: dict, key):
+        if key not in groups:
+            groups[key] = RunningStats(len(RoundStats.columns))
+        return groups[key]
+
+    def add(self, result: BattleResult):
+        maxRound = len(result.roundStats) - 1
+        for roundRow in result.roundStats:
+            round = roundRow[0]
+            values = np.array(roundRow[1:], dtype=float)
+            self._stats(self.byRound, round).add(values)
+            self._stats(self.byMaxRound, (maxRound, round)).add(values)
+
+    def merge(self, other: "RoundStats"):
+        for groups, otherGroups in ((self.byRound, other.byRound), (self.byMaxRound, other.byMaxRound)):
+            for key, stats in otherGroups.items():
+                self._stats(groups, key).merge(stats)
+
+    def toDataFrame(self, byMaxRound=False):
+        """Count, mean and standard deviation of every column per round, or per (Max Rounds, Round)."""
+        import pandas as pd
+
+        groups = self.byMaxRound if byMaxRound else self.byRound
+        keys = sorted(groups)
+        rows = []
+        for key in keys:
+            stats = groups[key]
+            rows.append([stats.count, *stats.mean(), *stats.std()])
+        stdColumns = [f"{column} Std Dev" for column in RoundStats.columns]
+        if byMaxRound:
+            index = pd.MultiIndex.from_tuples(keys, names=["Max Rounds", "Round"])
+        else:
+            index = pd.Index(keys, name="Round")
+        return pd.DataFrame(rows, index=index, columns=["Count", *RoundStats.columns, *stdColumns])
@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from statistics import median
+from Hit import HitCounts
+from Simulator import Simulator
+from TechMapping import Tech
+from UnitCollection import UnitCollection
+from UnitCounts import UnitCounts
+from UnitsEnum import Units
+from Config import Config
+import Registry
+
+benchmarkProfile = "Original_d6"
+armySizes = [10, 50, 200]
+
+# Composition of every 10 units of a benchmark army, scaled up to the army size
+armyMixes = {
+    "land": {
+        "attacker": {Units.Infantry: 3, Units.MechInfantry: 1, Units.Artillery: 2, Units.Tank: 2, Units.Fighter: 1, Units.TacticalBomber: 1},
+        "defender": {Units.Infantry: 5, Units.Artillery: 1, Units.Tank: 2, Units.AAA: 1, Units.Fighter: 1},
+    },
+    "naval": {
+        "attacker": {Units.Submarine: 2, Units.Destroyer: 2, Units.Cruiser: 1, Units.Battleship: 2, Units.Carrier: 1, Units.Fighter: 2},
+        "defender": {Units.Submarine: 2, Units.Destroyer: 3, Units.Cruiser: 1, Units.Battleship: 1, Units.Carrier: 1, Units.Fighter: 2},
+    },
+}
+
+
+def armyCounts(theater: str, side: str, size: int):
+    """Unit counts of the benchmark army of the given theater ("land" or "naval"), side and size."""
+    counts = UnitCounts()
+    for unit, count in armyMixes[theater][side].items():
+        counts.add(unit, count * size // 10)
+    return counts
+
+
+class Benchmark:
+    """A named operation to time. setup(*args) is called once and returns the function that is timed;
+    calls is how many times to call it per timing (by default, enough calls to take minTime)."""
+
+    def __init__(self, name: str, setup, args=(), calls: int = None):
+        self.name = name
+        self.setup = setup
+        self.args = args
+        self.calls = calls
+
+
+def _construction(theater, size, techs):
+    unitList = armyCounts(theater, "attacker", size)
+    profile = Registry.getProfile(benchmarkProfile)
+    return lambda: UnitCollection(unitList, profile, techs=techs)
+
+
+def _collection(theater, size):
+    return UnitCollection(armyCounts(theater, "attacker", size), Registry.getProfile(benchmarkProfile))
+
+
+def _takeLosses(theater, size):
+    units = _collection(theater, size)
+
+    def run():
+        # Destroy the collection one hit at a time (the reset is timed too)
+        while units.currHP() > 0:
+            units.takeLosses(HitCounts.general())
+        units.reset()
+
+    return run
+
+
+def _expectedHits(theater, size):
+    units = _collection(theater, size)
+    return lambda: (units.expectedHits(True), units.expectedHits(False))
+
+
+def _hitCurve(theater, size):
+    units = _collection(theater, size)
+    return lambda: units.generateHitCurve(True)
+
+
+def _simulator(theater, size):
+    sim = Simulator()
+    profile = Registry.getProfile(benchmarkProfile)
+    sim.attacker = UnitCollection(armyCounts(theater, "attacker", size), profile)
+    sim.defender = UnitCollection(armyCounts(theater, "defender", size), profile)
+    return sim
+
+
+def _simulateBattle(theater, size):
+    sim = _simulator(theater, size)
+    seeds = iter(range(sys.maxsize))
+
+    def run():
+        sim.SimulateBattle(isLand=theater == "land", seed=next(seeds))
+        sim.reset()
+
+    return run
+
+
+def _battleStats(theater, size, battleCount):
+    sim = _simulator(theater, size)
+
+    def run():
+        # The stats table isn't part of the benchmark output
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.GenerateBattleStats(battleCount, seed=0)
+
+    return run
+
+
+def benchmarks(battleCount=10000):
+    rv = []
+    for theater in armyMixes:
+        for size in armySizes:
+            suffix = f"{theater}-{size}"
+            rv.extend(
+                [
+                    Benchmark(f"construct/{suffix}", _construction, (theater, size, [])),
+                    Benchmark(f"construct-all-techs/{suffix}", _construction, (theater, size, list(Tech))),
+                    Benchmark(f"takeLosses/{suffix}", _takeLosses, (theater, size)),
+                    Benchmark(f"expectedHits/{suffix}", _expectedHits, (theater, size)),
+                    Benchmark(f"generateHitCurve/{suffix}", _hitCurve, (theater, size)),
+                    Benchmark(f"SimulateBattle/{suffix}", _simulateBattle, (theater, size)),
+                    Benchmark(f"GenerateBattleStats-{battleCount}/{suffix}", _battleStats, (theater, size, battleCount), calls=1),
+                ]
+            )
+    return rv
+
+
+def timeBenchmark(benchmark: Benchmark, repeat: int, minTime=0.2):
+    """Seconds per call of the benchmark's function: every timing calls it enough times to take at least
+    minTime (or benchmark.calls times), the best and median of repeat timings are reported."""
+    func = benchmark.setup(*benchmark.args)
+    calls = benchmark.calls
+    if calls is None:
+        calls = 1
+        while True:
+            start = time.perf_counter()
+            for i in range(calls):
+                func()
+            elapsed = time.perf_counter() - start
+            if elapsed >= minTime:
+                break
+            calls = calls * 10 if elapsed < minTime / 10 else calls * 2
+    timings = []
+    for r in range(repeat):
+        start = time.perf_counter()
+        for i in range(calls):
+            func()
+        timings.append((time.perf_counter() - start) / calls)
+    return {"best": min(timings), "median": median(timings), "calls": calls, "repeat": repeat}
+
+
+def _commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def runBenchmarks(names=None, repeat=5, battleCount=10000):
+    """Time every benchmark (or the ones whose name contains one of names) and return the results
+    along with where they were measured."""
+    results = {}
+    for benchmark in benchmarks(battleCount):
+        if names and not any(name in benchmark.name for name in names):
+            continue
+        results[benchmark.name] = timeBenchmark(benchmark, repeat)
+        print(f"{benchmark.name}: {_formatSeconds(results[benchmark.name]['best'])}", flush=True)
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "diceSize": Config.DICE_SIZE,
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance=0.1):
+    """Rows of (name, baseline seconds, current seconds, ratio) for the benchmarks in both runs, and
+    the names that got slower by more than the tolerance (e.g., 0.1 = 10%)."""
+    rows = []
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["best"]
+        ratio = result["best"] / before
+        rows.append((name, before, result["best"], ratio))
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _formatSeconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def printComparison(rows, regressions, baseline: dict):
+    from tabulate import tabulate
+
+    print(f"Compared to {baseline.get('commit')} ({baseline.get('created')})")
+    table = [["Benchmark", "Baseline", "Current", "Ratio"]]
+    for name, before, after, ratio in rows:
+        flag = " (slower)" if name in regressions else ""
+        table.append([name, _formatSeconds(before), _formatSeconds(after), f"{ratio:.2f}{flag}"])
+    print(tabulate(table, headers="firstrow", tablefmt="fancy_grid"))
+
+
+class Inputs:
+    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the simulator hot paths on land and naval armies of several sizes.")
+    inputs = Inputs()
+    parser.add_argument("names", nargs="*", help="Only run the benchmarks whose name contains one of these")
+    parser.add_argument("-o", "--output", help="Save the results as a JSON baseline")
+    parser.add_argument("-c", "--compare", help="JSON baseline to compare the results against")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Timings per benchmark")
+    parser.add_argument("-n", "--battles", type=int, default=10000, help="Battles of the GenerateBattleStats benchmarks")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.1, help="Slowdown reported as a regression")
+    parser.parse_args(namespace=inputs)
+
+    current = runBenchmarks(inputs.names, inputs.repeat, inputs.battles)
+    if inputs.output:
+        with open(inputs.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=4)
+    if inputs.compare:
+        with open(inputs.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressions = compare(baseline, current, inputs.tolerance)
+        printComparison(rows, regressions, baseline)
+        sys.exit(1 if regressions else 0)
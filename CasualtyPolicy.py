@@ -0,0 +1,96 @@
+from Hit import HitCounts
+from UnitCollection import UnitCollection
+from Units import *
+
+
+class CasualtyPolicy:
+    """Decides which units a collection loses to the hits scored against it (see BattlePolicy).
+
+    choose is called when the hits are rolled and apply with its return value once both sides have
+    rolled. The automated policies only decide the order in which the victim's unit types take the
+    hits, and the hits are then applied to the unit counts (see UnitCollection.takeLosses), so taking
+    a hit costs the same whatever the size of the collection."""
+
+    def choose(self, victim: UnitCollection, aggressor: UnitCollection, hits: HitCounts, side: str):
+        return (hits, self.lossPriority(victim, aggressor, side))
+
+    def apply(self, victim: UnitCollection, casualties):
+        hits, lossPriority = casualties
+        victim.takeLosses(hits, lossPriority)
+
+    def lossPriority(self, victim: UnitCollection, aggressor: UnitCollection, side: str):
+        """Unit types in the order they take hits, None for the victim's own loss priority."""
+        return None
+
+
+class LossPriorityPolicy(CasualtyPolicy):
+    """Hits follow the victim's loss priority (see UnitCollection.defineLossPriority)."""
+
+
+class ProtectStrengthPolicy(CasualtyPolicy):
+    """Protects the strongest units: the unit types that take the least combat strength with them are lost
+    first (attack strength for the attacker, defense strength for the defender). Losing a combo unit only
+    costs the strength it has over the units it leaves behind (e.g., an infantry-artillery pair loses the
+    infantry and the artillery's support, a battleship only gets damaged). Ties go to the unit that costs
+    the least IPCs to lose, then to the victim's loss priority."""
+
+    def __init__(self):
+        # ProtectStrengthPolicy._key -> loss priority
+        self._priorities = {}
+
+    def _key(victim: UnitCollection, side: str):
+        """Everything the loss priority depends on: the side, the victim's loss priority, techs, strengths and costs."""
+        profile = tuple(
+            (unitType, tuple(tuple(strength) for strength in strengths), victim.unitCosts[unitType])
+            for unitType, strengths in victim.unitStrengths.items()
+        )
+        return (side, tuple(victim._lossPriority), frozenset(victim.Techs), profile)
+
+    def lossPriority(self, victim: UnitCollection, aggressor: UnitCollection, side: str):
+        key = ProtectStrengthPolicy._key(victim, side)
+        if key not in self._priorities:
+            isAttack = side == "Attacker"
+            unitTypes = [t for t in victim._lossPriority if t in victim.unitStrengths]
+            self._priorities[key] = sorted(unitTypes, key=lambda t: ProtectStrengthPolicy._loss(victim, t, isAttack))
+        return self._priorities[key]
+
+    def _loss(victim: UnitCollection, unitType, isAttack: bool):
+        """(combat strength, cost) lost with a unit of the given type."""
+
+        def value(t):
+            if t not in victim.unitStrengths:
+                return (0, 0)
+            unit = victim._prototype(t)
+            return (sum(unit.attackStrength if isAttack else unit.defenseStrength), victim.unitCosts[t])
+
+        strength, cost = value(unitType)
+        if issubclass(unitType, ComboUnit):
+            survivorStrength, survivorCost = value(unitType.priority[0])
+            return (strength - survivorStrength, cost - survivorCost)
+        return (strength, cost)
+
+
+class SoakDamagePolicy(CasualtyPolicy):
+    """Preserves the 2-HP ships: undamaged battleships and carriers take hits first, since a hit only
+    damages them, and damaged ones are lost last. The other units follow the victim's loss priority."""
+
+    def __init__(self):
+        # Victim loss priority -> loss priority
+        self._priorities = {}
+
+    def lossPriority(self, victim: UnitCollection, aggressor: UnitCollection, side: str):
+        key = tuple(victim._lossPriority)
+        if key not in self._priorities:
+            undamaged = [t for t in key if issubclass(t, (Battleship, Carrier))]
+            damaged = [t for t in key if issubclass(t, (DamagedBattleship, DamagedCarrier))]
+            rest = [t for t in key if t not in undamaged and t not in damaged]
+            self._priorities[key] = undamaged + rest + damaged
+        return self._priorities[key]
+
+
+# Automated casualty policies by the name used on the command line
+casualtyPolicies = {
+    "loss-priority": LossPriorityPolicy,
+    "protect-strength": ProtectStrengthPolicy,
+    "soak-damage": SoakDamagePolicy,
+}
@@ -0,0 +1,126 @@
+import numpy as np
+from Dice import hitProbability
+from Hit import HitCounts, hitCategory
+from Units import *
+from UnitsEnum import Units
+from UnitCollection import UnitCollection, unitDict, validTargets
+
+
+class FirstStrikeGroup:
+    """Dice of first strike units that share the same counter units (e.g., submarines and destroyers)."""
+
+    def __init__(self, counters: tuple, attackDice: np.ndarray, defenseDice: np.ndarray):
+        self.counters = counters
+        self.attackDice = attackDice
+        self.defenseDice = defenseDice
+
+
+class CompiledCollection:
+    """A unit collection unrolled along its loss priority order.
+
+    Row k of every table describes the collection after it has taken k casualties from
+    hits that any unit can absorb, so a collection's state during a battle is a single
+    casualty index and applying n hits is just moving n rows further along the order.
+    The dice tables count how many dice of each hit probability (see probs) the
+    collection rolls in each state.
+
+    The unrolling assumes every hit can be applied to the next unit in the loss
+    priority. Matchups with target restrictions (submarine hits vs. aircraft, aircraft
+    vs. submarines) are rejected by checkTargets and have to use the BattleEngine."""
+
+    def __init__(self, collection: UnitCollection):
+        self.power = collection.power
+        collection.reset()
+        counts, hp, cost = [], [], []
+        while True:
+            counts.append(collection._counts.asList())
+            hp.append(collection.currHP())
+            cost.append(collection.currCost())
+            if collection._counts.total() == 0:
+                break
+            collection.takeLosses(HitCounts.general(1))
+        collection.reset()
+
+        self.counts = np.array(counts, dtype=np.int64)
+        self.hp = np.array(hp)
+        self.cost = np.array(cost)
+        self.maxIndex = len(self.hp) - 1
+        self._instanceCache = {}
+        self._loadDice(collection)
+
+    def _loadDice(self, collection: UnitCollection):
+        presentTypes = [u for u in Units if self.counts[:, u.value].any()]
+        prototypes = {u: collection._makeUnit(unitDict[u]) for u in presentTypes}
+
+        # Collect the distinct hit probabilities the collection can roll
+        probs = set()
+        for unit in prototypes.values():
+            if isinstance(unit, CombatUnit):
+                for strength in [*unit.attackStrength, *unit.defenseStrength]:
+                    probs.add(hitProbability(strength, unit.advantage))
+        self.probs = np.array(sorted(probs), dtype=float)
+        probIndex = {p: i for i, p in enumerate(self.probs)}
+
+        # Dice rolled by a single unit of each type
+        attackTypeDice = np.zeros((len(Units), len(self.probs)), dtype=np.int64)
+        defenseTypeDice = np.zeros((len(Units), len(self.probs)), dtype=np.int64)
+        for unitEnum, unit in prototypes.items():
+            if not isinstance(unit, CombatUnit):
+                continue
+            for strength in unit.attackStrength:
+                attackTypeDice[unitEnum.value, probIndex[hitProbability(strength, unit.advantage)]] += 1
+            for strength in unit.defenseStrength:
+                defenseTypeDice[unitEnum.value, probIndex[hitProbability(strength, unit.advantage)]] += 1
+
+        # Split first strike units into groups by their counters
+        generalMask = np.ones(len(Units), dtype=bool)
+        groupMasks = {}
+        for unitEnum, unit in prototypes.items():
+            if isinstance(unit, FirstStrikeUnit):
+                counters = tuple(unit._counterUnits)
+                groupMasks.setdefault(counters, np.zeros(len(Units), dtype=bool))[unitEnum.value] = True
+                generalMask[unitEnum.value] = False
+
+        self.attackDice = self.counts @ (attackTypeDice * generalMask[:, None])
+        self.defenseDice = self.counts @ (defenseTypeDice * generalMask[:, None])
+        self.firstStrikeGroups = [
+            FirstStrikeGroup(
+                counters,
+                self.counts @ (attackTypeDice * mask[:, None]),
+                self.counts @ (defenseTypeDice * mask[:, None]),
+            )
+            for counters, mask in groupMasks.items()
+        ]
+        # Dice that can score a hit in each state, first strike dice included (0 when the collection can't hit)
+        canHit = self.probs > 0
+        self.attackHitDice = (self.attackDice * canHit).sum(axis=1)
+        self.defenseHitDice = (self.defenseDice * canHit).sum(axis=1)
+        for group in self.firstStrikeGroups:
+            self.attackHitDice += (group.attackDice * canHit).sum(axis=1)
+            self.defenseHitDice += (group.defenseDice * canHit).sum(axis=1)
+        self.prototypes = prototypes
+
+    def hasInstance(self, unitType):
+        """Boolean array over casualty indices: does the collection still contain a unitType?"""
+        if unitType not in self._instanceCache:
+            mask = np.array([issubclass(unitDict[u], unitType) for u in Units])
+            self._instanceCache[unitType] = (self.counts[:, mask] > 0).any(axis=1)
+        return self._instanceCache[unitType]
+
+    def checkTargets(self, opponent: "CompiledCollection"):
+        """Raise a ValueError if any of this collection's hits could not be applied to the
+        opponent's next casualty (i.e., the matchup cannot be unrolled)."""
+        targetTypes = [u for u in Units if opponent.counts[:, u.value].any()]
+        for unitEnum, unit in self.prototypes.items():
+            if not isinstance(unit, CombatUnit):
+                continue
+            targets = validTargets[hitCategory(type(unit)).value]
+            for targetType in targetTypes:
+                if not targets[targetType.value]:
+                    raise ValueError(
+                        f"{unitEnum.name} hits cannot be applied to {unitDict[targetType].__name__}; "
+                        "simulate this matchup with the BattleEngine instead"
+                    )
+
+    def __str__(self):
+        return f"Compiled collection: {self.hp[0]} HP, {self.cost[0]} IPC, {len(self.probs)} hit probabilities"
@@ -1,4 +1,6 @@
 class Config:
     DICE_SIZE = 6
     ROLL_DELAY_MS = 0
-    SUPER_SUB_STRENGTH = 2 if DICE_SIZE == 12 else 1
\ No newline at end of file
+    SUPER_SUB_STRENGTH = 2 if DICE_SIZE == 12 else 1
+    # Cross-check the HP, cost and unit counts UnitCollection keeps up to date against the slow path (debugging aid)
+    CHECK_CACHED_TOTALS = False
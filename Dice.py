@@ -0,0 +1,55 @@
+from math import comb
+import numpy as np
+from Config import Config
+
+_hitOutcomes = {}
+
+
+def hitOutcomes(strength: int, advantage: bool = False):
+    """Number of the DICE_SIZE² equally likely outcomes of rolling two dice in which a die at the
+    given strength scores a hit (with advantage, the lower of the two dice is used). Summing these
+    keeps expected hit computations exact until the final division."""
+    key = (strength, Config.DICE_SIZE, advantage)
+    if key not in _hitOutcomes:
+        size = Config.DICE_SIZE
+        hitFaces = min(max(strength, 0), size)
+        if advantage:
+            _hitOutcomes[key] = size**2 - (size - hitFaces) ** 2
+        else:
+            _hitOutcomes[key] = hitFaces * size
+    return _hitOutcomes[key]
+
+
+def hitProbability(strength: int, advantage: bool = False):
+    """Probability that a single die at the given strength scores a hit."""
+    return hitOutcomes(strength, advantage) / Config.DICE_SIZE**2
+
+
+def hitDistribution(dice: np.ndarray, probs: np.ndarray):
+    """Exact distribution of the number of hits scored by the given dice (counts per hit probability)."""
+    pmf = np.ones(1)
+    for n, p in zip(dice, probs):
+        if n == 0:
+            continue
+        binomial = np.array([comb(n, k) * p**k * (1 - p) ** (n - k) for k in range(n + 1)])
+        pmf = np.convolve(pmf, binomial)
+    return pmf
+
+
+class DiceRoller:
+    """Source of all dice rolls, backed by a NumPy random Generator. Rolling from a roller
+    created with a seed makes the rolls (and so the battles fought with them) reproducible."""
+
+    def __init__(self, seed=None):
+        self.generator = np.random.default_rng(seed)
+
+    def roll(self, count: int, advantage: bool = False):
+        """Roll count dice at once. With advantage, each die is the lower of two rolls."""
+        rolls = self.generator.integers(1, Config.DICE_SIZE + 1, size=count)
+        if advantage:
+            rolls = np.minimum(rolls, self.generator.integers(1, Config.DICE_SIZE + 1, size=count))
+        return rolls
+
+
+# Roller used when none is given (e.g., interactive battles)
+defaultRoller = DiceRoller()
@@ -1,42 +1,79 @@
+from enum import Enum
 from Units import *
 
 
-class Hit:
-    def __init__(self, unit:CombatUnit):
-        self.Vulnerable = unit.ValidTargets
-        self.Immune = unit.ImmuneTargets.copy()
-
-    def UnitIsValidTarget(self, unit: Unit):
-        isVulnerable = any(isinstance(unit, vType) for vType in self.Vulnerable)
-        isImmune = any(isinstance(unit, iType) for iType in self.Immune)
-        return isVulnerable and not isImmune
-    
-    def UnitTypeIsValidTarget(self, unitType):
-        isVulnerable = any(issubclass(unitType, vType) for vType in self.Vulnerable)
-        isImmune = any(issubclass(unitType, iType) for iType in self.Immune)
-        return isVulnerable and not isImmune
-    
-    # There is likely a bug here. This method is really janky (weird behavior if there is more than one entry in the vulnerable lists)
-    def __lt__(self, that):
-        cmpVal = None
-        for type in self.Vulnerable:
-            for type2 in that.Vulnerable:
-                cmpVal = True if issubclass(type,type2) and type != type2 else cmpVal
-                cmpVal = False if issubclass(type2, type) and type != type2 else cmpVal
-        # If specified vulnerabilities are not subclasses of either, then prioritize hits with immunities.
-        if cmpVal == None:
-            cmpVal = len(self.Immune) > len(that.Immune)
-        return cmpVal
-    
-    # There is likely a bug here. This method is really janky (weird behavior if there is more than one entry in the vulnerable lists)
-    # This is only used if using the key=cmp_to_key method of sorting.
-    def cmp(this, that):
-        cmpVal = 0
-        for type in this.Vulnerable:
-            for type2 in that.Vulnerable:
-                cmpVal = -1 if issubclass(type,type2) and type != type2 else cmpVal
-                cmpVal = 1 if issubclass(type2, type) and type != type2 else cmpVal
-        # If specified vulnerabilities are not subclasses of either, then prioritize hits with immunities.
-        if cmpVal == 0:
-            cmpVal = len(that.Immune) - len(this.Immune)
-        return cmpVal
+class HitCategory(Enum):
+    """Kinds of hits, distinguished by the units they can be applied to. Hits are applied to a
+    collection in the order of the values below: the most restricted hits are applied first so
+    they are not left without a valid target by hits that could have gone anywhere."""
+
+    Submarine = 0  # Submarine hits can only be applied to naval units
+    Air = 1  # Air unit hits cannot be applied to submarines (unless a destroyer is present)
+    General = 2  # Hits that can be applied to any unit
+
+
+# All special unit hit restrictions are defined here, rather than in the specific unit classes.
+# Each category maps to the unit classes its hits can be applied to and the ones that are immune.
+categoryTargets = {
+    HitCategory.Submarine: ([NavalUnit], []),
+    HitCategory.Air: ([Unit], [Submarine]),
+    HitCategory.General: ([Unit], []),
+}
+
+
+def hitCategory(unitType, hasDestroyer=False):
+    """Category of the hits scored by units of the given type. A destroyer on the same side
+    cancels the air units' restriction against submarines."""
+    if issubclass(unitType, Submarine):
+        return HitCategory.Submarine
+    if issubclass(unitType, AirUnit) and not hasDestroyer:
+        return HitCategory.Air
+    return HitCategory.General
+
+
+def isValidTarget(category: HitCategory, unitType):
+    """Can hits of the given category be applied to units of the given type?"""
+    vulnerable, immune = categoryTargets[category]
+    isVulnerable = any(issubclass(unitType, vType) for vType in vulnerable)
+    isImmune = any(issubclass(unitType, iType) for iType in immune)
+    return isVulnerable and not isImmune
+
+
+class HitCounts:
+    """Number of hits scored in each hit category, indexed by the HitCategory value."""
+
+    __slots__ = ("_counts",)
+
+    def __init__(self, counts: list[int] = None):
+        self._counts = list(counts) if counts is not None else [0] * len(HitCategory)
+
+    def general(count=1):
+        """Hits that can be applied to any unit (e.g., to step through a collection's loss priority)."""
+        hits = HitCounts()
+        hits.add(HitCategory.General, count)
+        return hits
+
+    def add(self, category: HitCategory, count=1):
+        self._counts[category.value] += count
+
+    def count(self, category: HitCategory):
+        return self._counts[category.value]
+
+    def total(self):
+        return sum(self._counts)
+
+    def items(self):
+        """(category, count) pairs for every category with hits, in the order hits are applied."""
+        return [(HitCategory(i), c) for i, c in enumerate(self._counts) if c > 0]
+
+    def copy(self):
+        return HitCounts(self._counts)
+
+    def __eq__(self, other):
+        return isinstance(other, HitCounts) and self._counts == other._counts
+
+    def __len__(self):
+        return self.total()
+
+    def __str__(self):
+        return ", ".join(f"{category.name}: {count}" for category, count in self.items())
@@ -0,0 +1,182 @@
+import sys
+import numpy as np
+from CompiledCollection import CompiledCollection
+from Dice import hitDistribution
+
+
+def _clampDistribution(pmf: np.ndarray, remaining: int):
+    """Fold the probability of scoring more hits than there are units left into the last entry."""
+    if len(pmf) <= remaining + 1:
+        return pmf
+    clamped = pmf[: remaining + 1].copy()
+    clamped[-1] += pmf[remaining + 1 :].sum()
+    return clamped
+
+
+class BattleOdds:
+    """Exact outcome distribution of a battle as computed by the MarkovSolver."""
+
+    def __init__(self, attacker: CompiledCollection, defender: CompiledCollection, outcomes: np.ndarray):
+        # outcomes[i, j] is the probability the battle ends with the attacker at casualty index i
+        # and the defender at casualty index j
+        self.outcomes = outcomes
+        attackerHP = attacker.hp[:, None]
+        defenderHP = defender.hp[None, :]
+        swing = (attacker.cost[:, None] - attacker.cost[0]) - (defender.cost[None, :] - defender.cost[0])
+        self.ipcSwing = swing
+
+        self.attackerWinProbability = outcomes[attackerHP > defenderHP].sum()
+        self.attackerVictoryProbability = outcomes[(attackerHP > 0) & (defenderHP == 0)].sum()
+        self.defenderVictoryProbability = outcomes[(attackerHP == 0) & (defenderHP > 0)].sum()
+        self.mutualDestructionProbability = outcomes[(attackerHP == 0) & (defenderHP == 0)].sum()
+        self.expectedIpcSwing = (outcomes * swing).sum()
+        self.attackerSurvivors = self._survivors(attacker.hp, outcomes.sum(axis=1))
+        self.defenderSurvivors = self._survivors(defender.hp, outcomes.sum(axis=0))
+        self._attackerHP = attacker.hp
+        self._defenderHP = defender.hp
+
+    def _survivors(self, hp: np.ndarray, probs: np.ndarray):
+        """Probability of each remaining HP value, e.g. {10: 0.2, 9: 0.1, ...}"""
+        return {int(h): float(p) for h, p in zip(hp, probs) if p > 0}
+
+    def conditionalMeans(self, attackerWon: bool):
+        """Expected remaining HP of both sides and IPC swing given the attacker won (or lost)."""
+        attackerHP = self._attackerHP[:, None]
+        defenderHP = self._defenderHP[None, :]
+        mask = (attackerHP > defenderHP) if attackerWon else ~(attackerHP > defenderHP)
+        weights = self.outcomes * mask
+        total = weights.sum()
+        if total == 0:
+            return None
+        return {
+            "Remainder Attacker": (weights * attackerHP).sum() / total,
+            "Remainder Defender": (weights * defenderHP).sum() / total,
+            "Average IPC Swing (Attacker)": (weights * self.ipcSwing).sum() / total,
+        }
+
+    def __str__(self):
+        return f"Attacker win probability: {self.attackerWinProbability:.4%}, Expected IPC swing: {self.expectedIpcSwing:.2f}"
+
+
+class MarkovSolver:
+    """Solves a battle exactly as a Markov chain over (attacker, defender) casualty indices.
+
+    A round moves the battle from one pair of casualty indices to another with a
+    probability given by both sides' hit distributions in that state, so the outcome
+    distribution can be propagated through the states once instead of sampling battles.
+    Hit distributions are memoized per state. Like the BatchEngine, this requires a
+    matchup where every hit can be applied to the next unit in the loss priority."""
+
+    def __init__(self, retreatThreshold=0, maxRounds=-1):
+        self.retreatThreshold = retreatThreshold
+        self.maxRounds = sys.maxsize if maxRounds < 0 else maxRounds
+        self._distributions = {}
+
+    def solve(self, attacker: CompiledCollection, defender: CompiledCollection):
+        attacker.checkTargets(defender)
+        defender.checkTargets(attacker)
+        mass = np.zeros((attacker.maxIndex + 1, defender.maxIndex + 1))
+        mass[0, 0] = 1.0
+        terminal = self._terminalStates(attacker, defender)
+
+        if self.maxRounds == sys.maxsize:
+            outcomes = self._solveUnlimited(attacker, defender, mass, terminal)
+        else:
+            outcomes = self._solveLimited(attacker, defender, mass, terminal)
+        return BattleOdds(attacker, defender, outcomes)
+
+    def _terminalStates(self, attacker: CompiledCollection, defender: CompiledCollection):
+        attackerHP = attacker.hp[:, None]
+        defenderHP = defender.hp[None, :]
+        return (attackerHP == 0) | (defenderHP == 0) | (attackerHP <= self.retreatThreshold)
+
+    def _solveUnlimited(self, attacker, defender, mass, terminal):
+        """Single pass over the states in casualty order. Casualty indices never decrease, so once a
+        state is reached all mass flowing into it has arrived; rounds where nobody scores a hit are
+        folded in by rescaling the outgoing mass."""
+        for i in range(attacker.maxIndex + 1):
+            for j in range(defender.maxIndex + 1):
+                m = mass[i, j]
+                isStart = i == 0 and j == 0
+                if m == 0 or (terminal[i, j] and not isStart):
+                    continue
+                transition = self._transition(attacker, defender, i, j)
+                stay = transition[0, 0]
+                if terminal[i, j]:
+                    # Retreat thresholds are only checked after the first round
+                    mass[i, j] = 0
+                    mass[i:, j:] += m * transition
+                    continue
+                if stay >= 1:
+                    continue  # Neither side can score a hit, the battle is stuck in this state
+                mass[i:, j:] += (m / (1 - stay)) * transition
+                mass[i, j] = 0
+        return mass
+
+    def _solveLimited(self, attacker, defender, mass, terminal):
+        """Propagate the distribution round by round, for battles capped at maxRounds."""
+        for round in range(self.maxRounds):
+            nextMass = np.where(terminal, mass, 0.0)
+            active = np.argwhere((mass > 0) & (~terminal if round > 0 else True))
+            if len(active) == 0:
+                break
+            for i, j in active:
+                nextMass[i:, j:] += mass[i, j] * self._transition(attacker, defender, i, j)
+            if round == 0 and terminal[0, 0]:
+                nextMass[0, 0] -= mass[0, 0]
+            mass = nextMass
+        return mass
+
+    def _distribution(self, side: CompiledCollection, dice: np.ndarray):
+        key = (tuple(side.probs), tuple(dice))
+        if key not in self._distributions:
+            self._distributions[key] = hitDistribution(dice, side.probs)
+        return self._distributions[key]
+
+    def _transition(self, attacker: CompiledCollection, defender: CompiledCollection, i: int, j: int):
+        """Distribution over the casualty indices (relative to i, j) after one round fought from state (i, j)."""
+        transition = np.zeros((attacker.maxIndex - i + 1, defender.maxIndex - j + 1))
+
+        # First Strike Phase
+        attackerFirst, attackerGeneral = self._firstStrikeDice(attacker, defender, i, j, True)
+        defenderFirst, defenderGeneral = self._firstStrikeDice(defender, attacker, j, i, False)
+        attackerFirst = _clampDistribution(self._distribution(attacker, attackerFirst), defender.maxIndex - j)
+        defenderFirst = _clampDistribution(self._distribution(defender, defenderFirst), attacker.maxIndex - i)
+
+        # General Combat Phase, from every possible outcome of the first strike
+        for defenderHits, pDefender in enumerate(defenderFirst):
+            if pDefender == 0:
+                continue
+            i1 = i + defenderHits
+            for attackerHits, pAttacker in enumerate(attackerFirst):
+                if pAttacker == 0:
+                    continue
+                j1 = j + attackerHits
+                attackerDice = attacker.attackDice[i1] + attackerGeneral(i1)
+                defenderDice = defender.defenseDice[j1] + defenderGeneral(j1)
+                toDefender = _clampDistribution(self._distribution(attacker, attackerDice), defender.maxIndex - j1)
+                toAttacker = _clampDistribution(self._distribution(defender, defenderDice), attacker.maxIndex - i1)
+                transition[
+                    i1 - i : i1 - i + len(toAttacker), j1 - j : j1 - j + len(toDefender)
+                ] += pDefender * pAttacker * np.outer(toAttacker, toDefender)
+        return transition
+
+    def _firstStrikeDice(self, side: CompiledCollection, opponent: CompiledCollection, s: int, o: int, isAttack: bool):
+        """Dice rolled in the first strike phase from state s, and a function giving the first strike
+        dice (of countered units) that are rolled in the general combat phase instead."""
+        firstStrike = np.zeros(len(side.probs), dtype=np.int64)
+        counteredGroups = []
+        for group in side.firstStrikeGroups:
+            groupDice = group.attackDice if isAttack else group.defenseDice
+            if any(opponent.hasInstance(counter)[o] for counter in group.counters):
+                counteredGroups.append(groupDice)
+            else:
+                firstStrike += groupDice[s]
+
+        def generalDice(index):
+            dice = np.zeros(len(side.probs), dtype=np.int64)
+            for groupDice in counteredGroups:
+                dice += groupDice[index]
+            return dice
+
+        return firstStrike, generalDice
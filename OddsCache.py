@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from BattleEngine import BattleEngine
+from BattleStats import BattleStats
+from Config import Config
+from UnitCollection import UnitCollection
+
+defaultCacheFile = "OddsCache.sqlite"
+
+# Bump when the simulation changes in a way that makes stored results stale
+cacheVersion = 1
+
+
+def _collectionKey(collection: UnitCollection):
+    """Everything about a collection that affects its battles: the unit counts after combo pairing,
+    the contents of its profile, its techs and its loss priority."""
+    return {
+        "counts": collection._originalCounts.asList(),
+        "strengths": sorted([unitType.__name__, strengths] for unitType, strengths in collection.unitStrengths.items()),
+        "costs": sorted([unitType.__name__, cost] for unitType, cost in collection.unitCosts.items()),
+        "techs": sorted(tech.name for tech in collection.Techs),
+        "lossPriority": [unitType.__name__ for unitType in collection._originalLossPriority],
+    }
+
+
+def matchupKey(attacker: UnitCollection, defender: UnitCollection, engine: BattleEngine, battleCount: int, workers=1, seed=None):
+    """Canonical hash of a simulated matchup. Two runs with the same key give the same results (or, without a
+    seed, results drawn from the same distribution). The worker count only matters to seeded runs, since
+    the battles are split into one seeded chunk per worker."""
+    key = {
+        "version": cacheVersion,
+        "attacker": _collectionKey(attacker),
+        "defender": _collectionKey(defender),
+        "retreatThreshold": engine.retreatThreshold,
+        "maxRounds": engine.maxRounds,
+        "casualtyPolicy": type(engine.casualtyPolicy).__name__,
+        "diceSize": Config.DICE_SIZE,
+        "battles": battleCount,
+        "seed": seed,
+        "workers": workers if seed is not None else None,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class OddsCache:
+    """Battle stats of simulated matchups stored in a SQLite file, keyed by matchupKey, so repeated runs of
+    the same matchup are read back instead of simulated again. Only the maxEntries most recently used
+    results are kept.
+
+    Several processes can share the file: SQLite locks it while writing, and the connection waits up to
+    timeout seconds for another process' write to finish. Every process opens its own connection (the
+    connection isn't pickled along with the cache), which the threads of the process take turns using."""
+
+    def __init__(self, path=defaultCacheFile, maxEntries=10000, timeout=30.0):
+        self.path = path
+        self.maxEntries = maxEntries
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_pid"] = None
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        # A connection can't be shared with a forked process
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            # Readers don't block the writer (and the other way around) in write-ahead log mode
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS odds (key TEXT PRIMARY KEY, stats TEXT NOT NULL, lastUsed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS oddsLastUsed ON odds (lastUsed)")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> BattleStats:
+        """Stored stats of the matchup, or None if it isn't cached."""
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT stats FROM odds WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE odds SET lastUsed = ? WHERE key = ?", (time.time(), key))
+        return BattleStats.fromDict(json.loads(row[0]))
+
+    def put(self, key: str, stats: BattleStats):
+        """Store the stats of the matchup and evict the least recently used results beyond maxEntries."""
+        with self._lock:
+            connection = self._connect()
+            # Take the write lock up front, so the insert and the eviction see the same table
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO odds (key, stats, lastUsed) VALUES (?, ?, ?)",
+                    (key, json.dumps(stats.toDict()), time.time()),
+                )
+                connection.execute(
+                    "DELETE FROM odds WHERE key IN (SELECT key FROM odds ORDER BY lastUsed DESC LIMIT -1 OFFSET ?)",
+                    (self.maxEntries,),
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def getOrRun(self, key: str, run):
+        """Stored stats of the matchup, or the stats returned by run() (which are stored)."""
+        stats = self.get(key)
+        if stats is None:
+            stats = run()
+            self.put(key, stats)
+        return stats
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM odds").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM odds")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
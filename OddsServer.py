@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from BattleEngine import BattleEngine
+from BattleStats import BattleStats
+from OddsCache import OddsCache, defaultCacheFile, matchupKey
+from ParallelBattles import chunkSeeds, fightBattles
+from UnitCollection import UnitCollection, UnitUIMap
+from UnitCounts import UnitCounts
+import Registry
+
+defaultPort = 8765
+defaultMaxRounds = 100
+defaultTimeout = 60.0
+
+
+def _simulate(attacker: UnitCollection, defender: UnitCollection, engine: BattleEngine, battleCount: int, seed):
+    # The same battles as Simulator.GenerateBattleStats with a single worker
+    return fightBattles(attacker, defender, engine, BattleStats(), battleCount, chunkSeeds(seed, 1)[0])
+
+
+def _ready(i):
+    return os.getpid()
+
+
+class OddsService:
+    """Answers odds queries (see query) from a pool of worker processes that are started once and kept
+    running, so a query doesn't pay for starting Python and importing the simulator. Results are stored
+    in an OddsCache, and identical queries that arrive while one is being simulated wait for its result
+    instead of simulating it again.
+
+    A query is a dict like
+        {"attacker": {"infantry": 3, "armour": 2}, "defender": {"infantry": 4},
+         "profile": "Original_d6", "attackerPower": "Germans", "defenderPower": "Russians",
+         "battles": 10000, "seed": null, "retreatThreshold": 0, "maxRounds": -1}
+    with the units named like in the UI (see UnitUIMap). Everything but the units is optional;
+    "defenderProfile" gives the defender another profile than the attacker.
+
+    Battles are fought for at most maxRounds rounds (also when the query asks for more, or for no limit with a
+    negative maxRounds), and a query whose simulation takes longer than timeout seconds fails with a
+    TimeoutError instead of keeping its connection waiting."""
+
+    def __init__(self, workers=None, cache: OddsCache = None, maxBattles=100000, maxRounds=defaultMaxRounds, timeout=defaultTimeout):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.workers = os.cpu_count() if workers is None else workers
+        self.cache = OddsCache() if cache is None else cache
+        self.maxBattles = maxBattles
+        self.maxRounds = maxRounds
+        self.timeout = timeout
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Matchup key -> Future of the stats being simulated
+        self._inFlight = {}
+        self._lock = threading.Lock()
+        # Start every worker now rather than on the first queries
+        list(self._pool.map(_ready, range(self.workers)))
+
+    def _loadCollection(self, units: dict, profileName: str, power: str):
+        if not isinstance(units, dict):
+            raise ValueError("Units must be given as a dict of unit name to count")
+        unitList = UnitCounts()
+        for unit, count in units.items():
+            if unit not in UnitUIMap:
+                raise ValueError(f"Unknown unit {unit} (known units: {', '.join(UnitUIMap)})")
+            if not isinstance(count, int) or count < 0:
+                raise ValueError(f"Count of {unit} must be a non-negative integer")
+            unitList.add(UnitUIMap[unit], count)
+        try:
+            # Only profiles of the working directory
+            if os.path.basename(str(profileName)) != profileName:
+                raise FileNotFoundError(profileName)
+            profile = Registry.getProfile(profileName)
+        except FileNotFoundError:
+            raise ValueError(f"Unknown profile {profileName}")
+        return UnitCollection(unitList, profile, power)
+
+    def query(self, request: dict):
+        """Battle stats summary of the query (see BattleStats.summary) with the 95% confidence intervals of
+        the win rate and IPC swing, and whether it was read from the cache. Raises ValueError for an
+        invalid query and TimeoutError for a simulation that takes longer than the timeout."""
+        if not isinstance(request, dict) or "attacker" not in request or "defender" not in request:
+            raise ValueError("A query needs attacker and defender units")
+        profileName = request.get("profile", "Original_d6")
+        attacker = self._loadCollection(request["attacker"], profileName, request.get("attackerPower", "Neutral"))
+        defender = self._loadCollection(
+            request["defender"], request.get("defenderProfile", profileName), request.get("defenderPower", "Neutral")
+        )
+        battleCount = request.get("battles", 10000)
+        if not isinstance(battleCount, int) or not 0 < battleCount <= self.maxBattles:
+            raise ValueError(f"Battles must be an integer from 1 to {self.maxBattles}")
+        seed = request.get("seed")
+        if seed is not None and (not isinstance(seed, int) or seed < 0):
+            raise ValueError("Seed must be a non-negative integer")
+        retreatThreshold, maxRounds = request.get("retreatThreshold", 0), request.get("maxRounds", -1)
+        if not isinstance(retreatThreshold, int) or not isinstance(maxRounds, int):
+            raise ValueError("The retreat threshold and max rounds must be integers")
+        maxRounds = self.maxRounds if maxRounds < 0 else min(maxRounds, self.maxRounds)
+        engine = BattleEngine(retreatThreshold, maxRounds)
+
+        key = matchupKey(attacker, defender, engine, battleCount, 1, seed)
+        stats = self.cache.get(key)
+        cached = stats is not None
+        if not cached:
+            stats = self._simulate(key, attacker, defender, engine, battleCount, seed)
+        rv = stats.summary()
+        rv["Win Rate Interval"] = list(stats.winRateInterval())
+        rv["IPC Swing Interval"] = list(stats.ipcSwingInterval())
+        rv["Cached"] = cached
+        return rv
+
+    def _simulate(self, key, attacker, defender, engine, battleCount, seed) -> BattleStats:
+        with self._lock:
+            future = self._inFlight.get(key)
+            isOwner = future is None
+            if isOwner:
+                future = Future()
+                self._inFlight[key] = future
+        if not isOwner:
+            return future.result(timeout=self.timeout)
+        try:
+            # A simulation that times out keeps its worker busy until it's done, but maxRounds bounds it
+            stats = self._pool.submit(_simulate, attacker, defender, engine, battleCount, seed).result(timeout=self.timeout)
+            self.cache.put(key, stats)
+            future.set_result(stats)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inFlight[key]
+        return stats
+
+    def close(self):
+        self._pool.shutdown()
+        self.cache.close()
+
+
+class OddsRequestHandler(BaseHTTPRequestHandler):
+    """POST /odds with a JSON query (see OddsService) answers its odds as JSON; GET /health answers
+    whether the server is up."""
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"Status": "ok", "Workers": self.server.service.workers})
+        else:
+            self._send(404, {"Error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/odds":
+            self._send(404, {"Error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            self._send(200, self.server.service.query(request))
+        except ValueError as e:
+            self._send(400, {"Error": str(e)})
+        except TimeoutError:
+            self._send(504, {"Error": "The simulation took too long, try fewer battles"})
+        except Exception as e:
+            self.log_error("Query failed: %r", e)
+            self._send(500, {"Error": "Internal error"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def makeServer(service: OddsService, host="127.0.0.1", port=defaultPort):
+    server = ThreadingHTTPServer((host, port), OddsRequestHandler)
+    server.service = service
+    return server
+
+
+class Inputs:
+    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer battle odds queries over HTTP (see OddsService for the query format).")
+    inputs = Inputs()
+    parser.add_argument("-p", "--port", type=int, default=defaultPort)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (by default only this machine)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-c", "--cache", default=defaultCacheFile, help="SQLite file of cached odds")
+    parser.add_argument("-m", "--max-battles", dest="maxBattles", type=int, default=100000, help="Most battles per query")
+    parser.add_argument("-r", "--max-rounds", dest="maxRounds", type=int, default=defaultMaxRounds, help="Most rounds per battle")
+    parser.add_argument("-t", "--timeout", type=float, default=defaultTimeout, help="Seconds a query may simulate")
+    parser.parse_args(namespace=inputs)
+
+    service = OddsService(inputs.workers, OddsCache(inputs.cache), inputs.maxBattles, inputs.maxRounds, inputs.timeout)
+    server = makeServer(service, inputs.host, inputs.port)
+    print(f"Serving odds on http://{inputs.host}:{inputs.port}/odds with {service.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
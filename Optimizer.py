@@ -0,0 +1,210 @@
+import argparse
+import numpy as np
+from CompiledCollection import CompiledCollection
+from MarkovSolver import MarkovSolver
+from Registry import UnitProfile
+from UnitCollection import UnitCollection
+from UnitCounts import UnitCounts
+from UnitsEnum import Units
+import Registry
+
+# Units the attacker is bought from by default
+defaultUnitTypes = [Units.Infantry, Units.MechInfantry, Units.Artillery, Units.Tank, Units.Fighter, Units.TacticalBomber, Units.StratBomber]
+
+
+class Candidate:
+    """An attacker composition with its exact odds against the optimizer's defender."""
+
+    def __init__(self, counts: UnitCounts, cost, winProbability: float, ipcSwing: float):
+        self.counts = counts
+        self.cost = cost
+        self.winProbability = winProbability
+        self.ipcSwing = ipcSwing
+
+    def dominates(self, other: "Candidate"):
+        """At most as expensive, at least as likely to win and at least as profitable, and better in one."""
+        notWorse = self.cost <= other.cost and self.winProbability >= other.winProbability and self.ipcSwing >= other.ipcSwing
+        better = self.cost < other.cost or self.winProbability > other.winProbability or self.ipcSwing > other.ipcSwing
+        return notWorse and better
+
+    def __str__(self):
+        units = ", ".join(f"{count} {unit.name}" for unit, count in self.counts.items())
+        return f"{units}: {self.cost} IPC, {self.winProbability:.2%} win probability, {self.ipcSwing:.2f} IPC swing"
+
+
+class CompositionOptimizer:
+    """Searches the attacker compositions that can be bought with a budget for the ones that reach a target
+    win probability against a defender, using exact odds (see MarkovSolver) for every candidate.
+
+    Battles are solved backwards: the win probability and expected final costs from every (attacker state,
+    defender casualty index) pair are computed from the states a round can lead to. An attacker state is
+    its unit counts, and the losses it takes from there only depend on those counts, so the values are
+    cached by counts and shared by every candidate that passes through the same state (e.g., an army with
+    one more infantry than another becomes the other army after its first casualty). Like the MarkovSolver,
+    this only supports matchups where every hit can be applied to the next unit in the loss priority, and
+    battles are fought until one side is destroyed."""
+
+    def __init__(self, defender: UnitCollection, profile: UnitProfile):
+        self.profile = profile
+        self.defender = CompiledCollection(defender)
+        self._solver = MarkovSolver()
+        # Attacker counts -> [win probability, final attacker cost, final defender cost] from every defender casualty index
+        self._values = {}
+        # Attacker unit types whose hits and targets were checked against the defender
+        self._checkedTypes = set()
+
+    def _maxUnits(self, budget, costs, maxUnits):
+        """maxUnits, by default the most units the budget buys (which also limits units that cost nothing)."""
+        if maxUnits is not None:
+            return maxUnits
+        paidCosts = [cost for cost in costs if cost > 0]
+        if len(paidCosts) == 0:
+            raise ValueError("Give the most units to buy when every unit type costs nothing")
+        return budget // min(paidCosts)
+
+    def candidates(self, budget, unitTypes=None, maxUnits=None):
+        """Every non-empty composition of the unit types that costs at most budget (and has at most maxUnits units,
+        see _maxUnits)."""
+        unitTypes = defaultUnitTypes if unitTypes is None else unitTypes
+        costs = [self.profile.costs[unit] for unit in unitTypes]
+        maxUnits = self._maxUnits(budget, costs, maxUnits)
+
+        def compositions(index, remaining, unitsLeft):
+            if index == len(unitTypes):
+                yield []
+                return
+            limit = unitsLeft if costs[index] <= 0 else min(remaining // costs[index], unitsLeft)
+            for count in range(limit + 1):
+                for rest in compositions(index + 1, remaining - count * costs[index], unitsLeft - count):
+                    yield [count] + rest
+
+        for composition in compositions(0, budget, maxUnits):
+            if sum(composition) == 0:
+                continue
+            counts = UnitCounts()
+            for unit, count in zip(unitTypes, composition):
+                counts.add(unit, count)
+            yield counts
+
+    def evaluate(self, counts: UnitCounts):
+        """Exact win probability and expected IPC swing of the given attacker composition."""
+        attacker = CompiledCollection(UnitCollection(counts, self.profile))
+        unitTypes = tuple(unit for unit, count in counts.items())
+        if unitTypes not in self._checkedTypes:
+            attacker.checkTargets(self.defender)
+            self.defender.checkTargets(attacker)
+            self._checkedTypes.add(unitTypes)
+        values = self._solve(attacker)
+        winProbability, attackerCost, defenderCost = values[:, 0, 0]
+        ipcSwing = (attackerCost - attacker.cost[0]) - (defenderCost - self.defender.cost[0])
+        return Candidate(counts, attacker.cost[0], float(winProbability), float(ipcSwing))
+
+    def _solve(self, attacker: CompiledCollection):
+        defender = self.defender
+        values = np.zeros((3, attacker.maxIndex + 1, defender.maxIndex + 1))
+        # Casualty indices never decrease, so every state only depends on states after it
+        for i in range(attacker.maxIndex, -1, -1):
+            counts = tuple(attacker.counts[i])
+            if counts not in self._values:
+                for j in range(defender.maxIndex, -1, -1):
+                    values[:, i, j] = self._stateValue(attacker, i, j, values)
+                self._values[counts] = values[:, i, :].copy()
+            values[:, i, :] = self._values[counts]
+        return values
+
+    def _stateValue(self, attacker: CompiledCollection, i: int, j: int, values: np.ndarray):
+        defender = self.defender
+        final = [1.0 if attacker.hp[i] > defender.hp[j] else 0.0, attacker.cost[i], defender.cost[j]]
+        if attacker.hp[i] == 0 or defender.hp[j] == 0:
+            return final
+        transition = self._solver._transition(attacker, defender, i, j)
+        stay = transition[0, 0]
+        if stay >= 1:
+            return final  # Neither side can score a hit, the battle is stuck in this state
+        # Rounds where nobody scores a hit are folded in by rescaling (values[:, i, j] is still 0 here)
+        return (values[:, i:, j:] * transition).sum(axis=(1, 2)) / (1 - stay)
+
+    def search(self, budget, targetWinProbability, unitTypes=None, maxUnits=None):
+        """Candidates that reach the target win probability and are not dominated by another such candidate
+        (see Candidate.dominates), cheapest first. Candidates with the same cost, win probability and
+        IPC swing are all kept.
+
+        Compositions that contain a composition reaching the target (i.e., that only add units to it) are
+        skipped: the candidates are grown one unit at a time, smallest first, and a candidate that reaches
+        the target isn't grown further. Every composition below the target is still evaluated, about a
+        thousand per second, and their number grows quickly with the budget and the unit types: against
+        12 land units, 40 IPC of the 7 default unit types is about 2,000 compositions, 60 IPC about 16,000
+        and 150 IPC millions. Limit the unit types (4 unit types at 60 IPC are about 1,500 compositions),
+        maxUnits or the budget to keep searches in seconds."""
+        unitTypes = defaultUnitTypes if unitTypes is None else unitTypes
+        costs = [self.profile.costs[unit] for unit in unitTypes]
+        maxUnits = self._maxUnits(budget, costs, maxUnits)
+        reaching = []
+        reachingCounts = np.zeros((0, len(unitTypes)), dtype=np.int64)
+        # Compositions with the same number of units, as counts per unit type. Every composition is grown
+        # from the one without a unit of its last unit type, so it is only built once.
+        level = [tuple(1 if i == k else 0 for i in range(len(unitTypes))) for k, cost in enumerate(costs) if cost <= budget]
+        units = 1
+        while len(level) > 0 and units <= maxUnits:
+            levelReaching, growing = [], []
+            for composition in level:
+                counts = UnitCounts()
+                for unit, count in zip(unitTypes, composition):
+                    counts.add(unit, count)
+                candidate = self.evaluate(counts)
+                if candidate.winProbability >= targetWinProbability:
+                    levelReaching.append(composition)
+                    reaching.append(candidate)
+                else:
+                    growing.append(composition)
+            if len(levelReaching) > 0:
+                reachingCounts = np.vstack([reachingCounts, np.array(levelReaching, dtype=np.int64)])
+            level = []
+            for composition in growing:
+                spent = sum(count * cost for count, cost in zip(composition, costs))
+                last = max(i for i, count in enumerate(composition) if count > 0)
+                for k in range(last, len(unitTypes)):
+                    if spent + costs[k] > budget:
+                        continue
+                    grown = composition[:k] + (composition[k] + 1,) + composition[k + 1 :]
+                    if not (reachingCounts <= np.array(grown)).all(axis=1).any():
+                        level.append(grown)
+            units += 1
+        frontier = [c for c in reaching if not any(other.dominates(c) for other in reaching)]
+        return sorted(frontier, key=lambda c: (c.cost, -c.winProbability, -c.ipcSwing))
+
+    def toDataFrame(candidates: list[Candidate]):
+        import pandas as pd
+
+        unitTypes = [u for u in Units if any(c.counts.count(u) > 0 for c in candidates)]
+        rows = [
+            [c.counts.count(u) for u in unitTypes] + [c.cost, c.winProbability, c.ipcSwing] for c in candidates
+        ]
+        return pd.DataFrame(rows, columns=[u.name for u in unitTypes] + ["Cost", "Win Probability", "IPC Swing"])
+
+
+class Inputs:
+    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the cheapest attacks that reach a target win probability.")
+    inputs = Inputs()
+    parser.add_argument("defender", help="Unit list of the defender")
+    parser.add_argument("profile")
+    parser.add_argument("budget", type=int, help="IPCs the attacker can spend")
+    parser.add_argument("target", type=float, help="Win probability to reach (e.g., 0.9)")
+    parser.add_argument("-d", "--defender-profile", dest="defenderProfile", help="Profile of the defender (default: profile)")
+    parser.add_argument("-u", "--units", nargs="+", default=[u.name for u in defaultUnitTypes], help="Units the attacker can buy")
+    parser.add_argument("-m", "--max-units", dest="maxUnits", type=int, default=None, help="Most units to buy (default: as many of the cheapest unit as the budget buys)")
+    parser.parse_args(namespace=inputs)
+
+    profile = Registry.getProfile(inputs.profile)
+    defenderProfile = profile if inputs.defenderProfile is None else Registry.getProfile(inputs.defenderProfile)
+    defender = UnitCollection(Registry.getUnitList(inputs.defender), defenderProfile)
+    optimizer = CompositionOptimizer(defender, profile)
+    frontier = optimizer.search(inputs.budget, inputs.target, [Units[name] for name in inputs.units], inputs.maxUnits)
+    if len(frontier) == 0:
+        print(f"No attack within {inputs.budget} IPC reaches a {inputs.target:.0%} win probability.")
+    else:
+        print(CompositionOptimizer.toDataFrame(frontier).to_string(index=False))
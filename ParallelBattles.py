@@ -0,0 +1,124 @@
+import copy
+import os
+import numpy as np
+from BattleEngine import BattleEngine
+from BattleStats import BattleStats, PrecisionTarget
+from Dice import DiceRoller
+from UnitCollection import UnitCollection
+
+# Battle setup of the current worker process (see _initWorker)
+_worker = {}
+
+
+def chunkSeeds(seed, chunkCount: int):
+    """Independent seeds for each chunk of battles, derived from the master seed."""
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(chunkCount)]
+
+
+def chunkSizes(battleCount: int, chunkCount: int):
+    """Split battleCount into chunkCount (nearly) equal parts."""
+    size, extra = divmod(battleCount, chunkCount)
+    return [size + (1 if i < extra else 0) for i in range(chunkCount)]
+
+
+def fightBattles(attacker: UnitCollection, defender: UnitCollection, engine: BattleEngine, stats, battleCount: int, seed: int):
+    """Fight battleCount battles and add their results to stats. The battles roll their dice from a
+    DiceRoller seeded with the given seed (on a copy of the engine, the given engine isn't modified)."""
+    engine = copy.copy(engine)
+    engine.rng = DiceRoller(seed)
+    for i in range(battleCount):
+        stats.add(engine.run(attacker, defender))
+    attacker.reset()
+    defender.reset()
+    return stats
+
+
+def _initWorker(attacker, defender, engine, statsType):
+    _worker.update(attacker=attacker, defender=defender, engine=engine, statsType=statsType)
+
+
+def _fightChunk(battleCount: int, seed: int):
+    return fightBattles(
+        _worker["attacker"], _worker["defender"], _worker["engine"], _worker["statsType"](), battleCount, seed
+    )
+
+
+def _startPool(attacker: UnitCollection, defender: UnitCollection, engine: BattleEngine, statsType, workers: int):
+    """Process pool whose workers fight battles between copies of the collections (see _fightChunk)."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_initWorker,
+        initargs=(attacker, defender, engine, statsType),
+    )
+
+
+def _fightChunks(pool, statsType, battleCount: int, workers: int, seed):
+    """Fight battleCount battles split into one seeded chunk per worker of the pool and return the merged stats."""
+    chunkCount = max(1, min(workers, battleCount))
+    sizes = chunkSizes(battleCount, chunkCount)
+    seeds = chunkSeeds(seed, chunkCount)
+    chunkStats = list(pool.map(_fightChunk, sizes, seeds))
+
+    # Merge in chunk order so floating point totals don't depend on which chunk finished first
+    stats = statsType()
+    for s in chunkStats:
+        stats.merge(s)
+    return stats
+
+
+def runBattles(
+    attacker: UnitCollection,
+    defender: UnitCollection,
+    battleCount: int,
+    statsType,
+    engine: BattleEngine = None,
+    workers: int = None,
+    seed=None,
+):
+    """Fight battleCount battles split over a pool of worker processes and return the merged stats.
+
+    statsType is the class that collects the results (e.g., BattleStats); it needs add(result) and
+    merge(other) methods. The battles are split into one chunk per worker and every chunk rolls
+    its dice from its own seed derived from the master seed, so for a given seed and worker count
+    the results are the same on every run. The collections are copied to the workers once, the
+    originals are not modified."""
+    engine = BattleEngine() if engine is None else engine
+    workers = os.cpu_count() if workers is None else workers
+    with _startPool(attacker, defender, engine, statsType, max(1, min(workers, battleCount))) as pool:
+        return _fightChunks(pool, statsType, battleCount, workers, seed)
+
+
+def runUntilPrecise(
+    attacker: UnitCollection,
+    defender: UnitCollection,
+    target: PrecisionTarget,
+    engine: BattleEngine = None,
+    batchSize=1000,
+    maxBattles=100000,
+    workers=1,
+    seed=None,
+):
+    """Fight battles in batches of batchSize until the target precision is met (or maxBattles have
+    been fought) and return the BattleStats. Every batch rolls from its own seed derived from the
+    master seed, so the number of battles and the results are reproducible for a given seed and
+    worker count. With more than one worker each batch is split over a process pool, which is started
+    once for all the batches."""
+    engine = BattleEngine() if engine is None else engine
+    pool = _startPool(attacker, defender, engine, BattleStats, workers) if workers > 1 else None
+    stats = BattleStats()
+    try:
+        for batchSeed in chunkSeeds(seed, -(-maxBattles // batchSize)):
+            battleCount = min(batchSize, maxBattles - stats.battleCount)
+            if pool is not None:
+                batch = _fightChunks(pool, BattleStats, battleCount, workers, batchSeed)
+            else:
+                batch = fightBattles(attacker, defender, engine, BattleStats(), battleCount, batchSeed)
+            stats.merge(batch)
+            if target.isMet(stats):
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return stats
@@ -0,0 +1,111 @@
+import json
+from contextlib import nullcontext
+from time import perf_counter
+
+# Profiler of the battle being fought, if it is profiled (see BattleEngine's profiler). UnitCollection
+# reports the work it does outside of the engine's phases (e.g., combo unit pairing) to it.
+active = None
+
+# Shared do-nothing phase, so unprofiled battles don't create a context manager per phase
+_noPhase = nullcontext()
+
+
+def phase(name: str):
+    """Time the enclosed code as the given phase of the active profiler, if there is one."""
+    return _noPhase if active is None else active.phase(name)
+
+
+def count(name: str, n=1):
+    """Add n to the given counter of the active profiler, if there is one."""
+    if active is not None:
+        active.count(name, n)
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "BattleProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, perf_counter() - self.start)
+
+
+class BattleProfiler:
+    """Wall time and call counts of every phase of the battles fought while it is attached to a
+    BattleEngine, and counters of events (e.g., hits rolled or units instantiated), kept per battle
+    and round. Round 0 is the work done before the first round (e.g., resetting the collections).
+
+    Phases can be nested (e.g., combo unit pairing happens while casualties are applied), so the
+    time of a phase includes the time of the phases inside it."""
+
+    def __init__(self):
+        # (battle, round, phase) -> [calls, seconds]
+        self.phases = {}
+        # (battle, round, counter) -> count
+        self.counters = {}
+        self.battle = 0
+        self.round = 0
+
+    def startBattle(self):
+        self.battle += 1
+        self.round = 0
+
+    def startRound(self, round: int):
+        self.round = round
+
+    def phase(self, name: str):
+        return _Phase(self, name)
+
+    def record(self, name: str, seconds: float):
+        key = (self.battle, self.round, name)
+        entry = self.phases.get(key)
+        if entry is None:
+            self.phases[key] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def count(self, name: str, n=1):
+        key = (self.battle, self.round, name)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def rows(self, level="total"):
+        """One row per phase or counter, with its totals per round ("round"), per battle ("battle")
+        or over all battles ("total"). Counters have no time."""
+        keyLength = {"round": 2, "battle": 1, "total": 0}[level]
+        keyColumns = ["Battle", "Round"][:keyLength]
+        totals = {}
+        for (battle, round, name), (calls, seconds) in self.phases.items():
+            key = (battle, round)[:keyLength] + ("Phase", name)
+            entry = totals.setdefault(key, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        for (battle, round, name), n in self.counters.items():
+            key = (battle, round)[:keyLength] + ("Counter", name)
+            entry = totals.setdefault(key, [0, None])
+            entry[0] += n
+        rows = []
+        for key, (calls, seconds) in sorted(totals.items()):
+            row = dict(zip(keyColumns, key))
+            row.update({"Type": key[-2], "Name": key[-1], "Count": calls, "Seconds": seconds})
+            rows.append(row)
+        return rows
+
+    def toJSON(self, level="total"):
+        return json.dumps({"battles": self.battle, "rows": self.rows(level)}, indent=4)
+
+    def toDataFrame(self, level="total"):
+        import pandas as pd
+
+        return pd.DataFrame(self.rows(level))
+
+    def printTable(self, level="total"):
+        from tabulate import tabulate
+
+        print(f"Profiled battles: {self.battle}")
+        print(tabulate(self.rows(level), headers="keys", tablefmt="fancy_grid", floatfmt=".6f"))
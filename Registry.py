@@ -0,0 +1,93 @@
+import csv
+import os
+from UnitCounts import UnitCounts
+from UnitsEnum import Units
+
+unitListsFile = "unitLists.csv"
+comboSeparator = "^"
+
+
+class UnitProfile:
+    """A unit profile (UnitProfiles_<name>.csv) parsed into the combat strengths and cost of
+    every unit type it defines, keyed by Units enum value. Strengths are ([attack], [defense])
+    tuples with one value per unit in the combination (see comboSeparator)."""
+
+    def __init__(self, strengths: dict, costs: dict):
+        self.strengths = strengths
+        self.costs = costs
+
+    def fromRows(rows):
+        """Parse profile rows, given as dicts with the Key, Cost, Attack and Defense columns."""
+        strengths = {}
+        costs = {}
+        for row in rows:
+            # It's critical that the key values match the int value in the Units enum
+            unitEnum = Units(int(row["Key"]))
+            unitStrengths = []
+            for vals in (row["Attack"], row["Defense"]):
+                strengthVals = [int(x) for x in str.split(str(vals), comboSeparator)]
+                unitStrengths.append(strengthVals)
+            strengths[unitEnum] = tuple(unitStrengths)
+            # Costs are whole IPCs; fractional costs in a profile (e.g., 1.5) are truncated
+            costs[unitEnum] = int(float(row["Cost"]))
+        return UnitProfile(strengths, costs)
+
+
+def _parseProfile(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return UnitProfile.fromRows(csv.DictReader(f, delimiter=","))
+
+
+def _parseUnitLists(path):
+    """Parse the wide unit lists file into one UnitCounts per list (i.e., per column after Key and Unit)."""
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f, delimiter=",")
+        header = next(reader)
+        listNames = []
+        for listName in header[2:]:
+            # Repeated column names get a numbered suffix, like pandas does (e.g., "Attacker.1")
+            uniqueName, i = listName, 0
+            while uniqueName in listNames:
+                i += 1
+                uniqueName = f"{listName}.{i}"
+            listNames.append(uniqueName)
+        unitLists = {listName: UnitCounts() for listName in listNames}
+        for row in reader:
+            if len(row) == 0:
+                continue
+            unitEnum = Units(int(row[0]))
+            for listName, value in zip(listNames, row[2:]):
+                if value.strip() != "":
+                    unitLists[listName].add(unitEnum, int(value))
+    return unitLists
+
+
+# Parsed files of this process, keyed by path: (modification time, parsed contents)
+_parsedFiles = {}
+
+
+def _load(path, parser):
+    """Parse the file, or return the already parsed contents if the file hasn't changed since."""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _parsedFiles.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, parser(path))
+        _parsedFiles[path] = cached
+    return cached[1]
+
+
+def getProfile(profileName) -> UnitProfile:
+    return _load(f"UnitProfiles_{profileName}.csv", _parseProfile)
+
+
+def getUnitList(listName, unitListsFile=unitListsFile) -> UnitCounts:
+    """Unit counts of the given list (column) of the unit lists file."""
+    unitLists = _load(unitListsFile, _parseUnitLists)
+    if listName not in unitLists:
+        raise KeyError(f"Unit list {listName} not found in {unitListsFile}")
+    return unitLists[listName].copy()
+
+
+def clear():
+    """Forget every parsed file (e.g., to force files to be read again)."""
+    _parsedFiles.clear()
@@ -0,0 +1,234 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from BatchEngine import BatchEngine
+from BattleEngine import BattleEngine
+from CasualtyPolicy import ProtectStrengthPolicy, casualtyPolicies
+from CompiledCollection import CompiledCollection
+from Dice import DiceRoller
+from Hit import HitCategory, HitCounts
+from OddsCache import OddsCache
+from Optimizer import CompositionOptimizer
+from Sweep import CollectionLoader, matchupColumns, runSweep
+from UnitCollection import UnitCollection
+from UnitCounts import UnitCounts
+from Units import Infantry
+from UnitsEnum import Units
+import Registry
+
+checkProfile = "Original_d6"
+
+# Rounds after which a battle that should have ended is reported as hanging (instead of running forever)
+roundLimit = 1000
+
+
+def _collection(units: dict):
+    counts = UnitCounts()
+    for unit, count in units.items():
+        counts.add(unit, count)
+    return UnitCollection(counts, Registry.getProfile(checkProfile))
+
+
+def _fight(attacker: dict, defender: dict, engine: BattleEngine = None):
+    """Fight a battle between the unit counts and return (BattleResult, everything printed during the battle)."""
+    engine = BattleEngine(maxRounds=roundLimit, rng=DiceRoller(1)) if engine is None else engine
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = engine.run(_collection(attacker), _collection(defender))
+    return result, output.getvalue()
+
+
+def checkSubmarinesVsAir():
+    """Submarines and air units without a destroyer can't hit each other, so the battle ends as a stalemate
+    after the first round (it used to never end)."""
+    for attacker, defender in (({Units.Submarine: 2}, {Units.Fighter: 2}), ({Units.Fighter: 2}, {Units.Submarine: 2})):
+        result, output = _fight(attacker, defender)
+        assert result.stalemate, f"Not a stalemate: {result}"
+        assert result.rounds == 1, f"Stalemate after {result.rounds} rounds"
+        assert not result.attackerWon, f"Attacker won a stalemate: {result}"
+        assert output == "", f"Printed during the battle: {output!r}"
+
+
+def checkStalemateAfterLosses():
+    """Once the destroyer is lost, the fighters can't hit the submarines any more: the battle ends as a
+    stalemate or with one side destroyed."""
+    for seed in range(20):
+        engine = BattleEngine(maxRounds=roundLimit, rng=DiceRoller(seed))
+        result, output = _fight({Units.Fighter: 3}, {Units.Submarine: 2, Units.Destroyer: 1}, engine)
+        assert result.rounds < roundLimit, f"Battle didn't end: {result}"
+        assert result.stalemate or result.attackerHP == 0 or result.defenderHP == 0, f"Unexpected end: {result}"
+        assert output == "", f"Printed during the battle: {output!r}"
+
+
+def checkBatchStalemate():
+    """Conscripts attacking an AAA gun roll no dice that can hit, so every batch battle ends as a stalemate after
+    the first round, like in the BattleEngine (it used to never end)."""
+    attacker, defender = {Units.Conscript: 1}, {Units.AAA: 1}
+    result = BatchEngine(seed=1).run(CompiledCollection(_collection(attacker)), CompiledCollection(_collection(defender)), 100)
+    assert result.stalemate.all(), f"{(~result.stalemate).sum()} battles weren't stalemates"
+    assert (result.rounds == 1).all(), f"Stalemates after up to {result.rounds.max()} rounds"
+    single, output = _fight(attacker, defender)
+    assert single.stalemate and single.rounds == 1, f"BattleEngine: {single}"
+
+
+def checkUnappliedHits():
+    """Hits without a valid target are dropped without printing anything, and counted."""
+    collection = _collection({Units.Fighter: 2})
+    hits = HitCounts()
+    hits.add(HitCategory.Submarine, 3)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        unapplied = collection.takeLosses(hits)
+    assert unapplied == 3, f"{unapplied} unapplied hits instead of 3"
+    assert collection.currHP() == 2, f"Fighters took submarine hits (HP {collection.currHP()})"
+    assert output.getvalue() == "", f"Printed while taking losses: {output.getvalue()!r}"
+
+
+def checkNavalPolicies():
+    """Submarines against carriers and fighters end (as a stalemate once only submarines and air units are left)
+    without printing anything under every casualty policy."""
+    matchups = [
+        ({Units.Submarine: 2}, {Units.Carrier: 1, Units.Fighter: 2}),
+        ({Units.Carrier: 1, Units.Fighter: 2}, {Units.Submarine: 2}),
+        ({Units.Submarine: 2, Units.Destroyer: 1}, {Units.Carrier: 1, Units.Fighter: 2}),
+        ({Units.Submarine: 1, Units.Carrier: 1, Units.Fighter: 2}, {Units.Submarine: 2, Units.Destroyer: 1, Units.Fighter: 1}),
+    ]
+    for name, policy in casualtyPolicies.items():
+        for attacker, defender in matchups:
+            for seed in range(10):
+                engine = BattleEngine(maxRounds=roundLimit, rng=DiceRoller(seed), casualtyPolicy=policy())
+                result, output = _fight(attacker, defender, engine)
+                assert result.rounds < roundLimit, f"{name}: battle didn't end: {result}"
+                assert result.stalemate or result.retreated or result.attackerHP == 0 or result.defenderHP == 0, (
+                    f"{name}: unexpected end: {result}"
+                )
+                assert output == "", f"{name}: printed during the battle: {output!r}"
+
+
+def checkProtectStrengthKey():
+    """Protect strength loss priorities are shared by collections with the same contents, not by the same object."""
+    policy = ProtectStrengthPolicy()
+    units = {Units.Infantry: 2, Units.Artillery: 1, Units.Tank: 1}
+    first = policy.lossPriority(_collection(units), None, "Attacker")
+    assert policy.lossPriority(_collection(units), None, "Attacker") == first, "Different priorities for equal collections"
+    policy.lossPriority(_collection(units), None, "Defender")
+    assert len(policy._priorities) == 2, f"{len(policy._priorities)} cached priorities instead of 2"
+
+
+class _CountingCache(OddsCache):
+    """OddsCache that counts the results stored in it."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.puts = 0
+
+    def put(self, key, stats):
+        self.puts += 1
+        super().put(key, stats)
+
+
+def checkSweepCache():
+    """Running the same sweep again (with or without a seed, with the rows reordered) reads every matchup
+    back from the cache instead of simulating it again."""
+    import pandas as pd
+
+    rows = [["Germany", checkProfile, "Russia", checkProfile], ["Attacker", checkProfile, "Defender", checkProfile]]
+    loader = CollectionLoader("UnitLists.csv")
+    for seed in (None, 5):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = _CountingCache(os.path.join(directory, "odds.sqlite"))
+            try:
+                first = runSweep(pd.DataFrame(rows, columns=matchupColumns), 200, 1, seed, loader, cache)
+                assert cache.puts == 2, f"Seed {seed}: {cache.puts} results stored instead of 2"
+                second = runSweep(pd.DataFrame(rows[::-1], columns=matchupColumns), 200, 1, seed, loader, cache)
+                assert cache.puts == 2, f"Seed {seed}: the second sweep simulated {cache.puts - 2} matchups again"
+                assert len(cache) == 2, f"Seed {seed}: {len(cache)} cached results instead of 2"
+                assert first.equals(second.iloc[::-1].reset_index(drop=True)), f"Seed {seed}: different results"
+            finally:
+                cache.close()
+
+
+def checkOptimizerSearch():
+    """A search over a few unit types stays in seconds, and skipping the compositions that contain one reaching
+    the target doesn't lose any of the smallest compositions that reach it."""
+    profile = Registry.getProfile(checkProfile)
+    defender = {Units.Infantry: 8, Units.Artillery: 2, Units.Tank: 2}
+    unitTypes = [Units.Infantry, Units.Artillery, Units.Tank, Units.Fighter]
+    optimizer = CompositionOptimizer(_collection(defender), profile)
+    start = time.perf_counter()
+    frontier = optimizer.search(60, 0.9, unitTypes)
+    seconds = time.perf_counter() - start
+    assert len(frontier) > 0, "No composition reaches the target"
+    assert seconds < 20, f"The search took {seconds:.1f} s"
+
+    # Every composition of a smaller matchup, keeping the ones that don't contain another one that reaches the target
+    optimizer = CompositionOptimizer(_collection({Units.Infantry: 3, Units.Tank: 1}), profile)
+    reaching = [c for c in map(optimizer.evaluate, optimizer.candidates(30, unitTypes)) if c.winProbability >= 0.6]
+
+    def contains(big, small):
+        return big is not small and all(big.counts.count(u) >= small.counts.count(u) for u in unitTypes)
+
+    smallest = [c for c in reaching if not any(contains(c, other) for other in reaching)]
+    expected = sorted(str(c) for c in smallest if not any(other.dominates(c) for other in smallest))
+    found = sorted(str(c) for c in optimizer.search(30, 0.6, unitTypes))
+    assert len(found) > 0 and found == expected, f"Found {found} instead of {expected}"
+
+
+def checkLossPriorityGap():
+    """Units missing from the loss priority take the hits left over after it, in unit order, without writing
+    anything (to stdout or, through logging, to stderr)."""
+    collection = _collection({Units.Infantry: 2, Units.Tank: 1})
+    collection.defineLossPriority([Infantry])
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        unapplied = collection.takeLosses(HitCounts.general(3))
+    assert unapplied == 0, f"{unapplied} unapplied hits instead of 0"
+    assert collection.currHP() == 0, f"HP {collection.currHP()} left instead of 0"
+    assert output.getvalue() == "", f"Written while taking losses: {output.getvalue()!r}"
+
+
+# Name -> check, which raises AssertionError when it fails
+checks = {
+    "submarines vs air": checkSubmarinesVsAir,
+    "stalemate after losses": checkStalemateAfterLosses,
+    "batch stalemate": checkBatchStalemate,
+    "unapplied hits": checkUnappliedHits,
+    "loss priority gap": checkLossPriorityGap,
+    "naval casualty policies": checkNavalPolicies,
+    "protect strength key": checkProtectStrengthKey,
+    "sweep cache": checkSweepCache,
+    "optimizer search": checkOptimizerSearch,
+}
+
+
+def runChecks(names=None):
+    """Run the checks whose name contains one of the names (by default all of them) and return the
+    names of the failed checks."""
+    failed = []
+    for name, check in checks.items():
+        if names and not any(n in name for n in names):
+            continue
+        try:
+            check()
+            print(f"ok      {name}")
+        except AssertionError as e:
+            print(f"FAILED  {name}: {e}")
+            failed.append(name)
+    return failed
+
+
+class Inputs:
+    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check battle behaviours that were broken before.")
+    inputs = Inputs()
+    parser.add_argument("names", nargs="*", help="Only run the checks whose name contains one of these")
+    parser.parse_args(namespace=inputs)
+
+    sys.exit(1 if runChecks(inputs.names) else 0)
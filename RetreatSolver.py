@@ -0,0 +1,177 @@
+import argparse
+import numpy as np
+from BattleEngine import BattlePolicy
+from CompiledCollection import CompiledCollection
+from MarkovSolver import MarkovSolver
+from UnitCollection import UnitCollection
+import Registry
+
+# What the retreat decisions maximize: the expected IPC swing (attacker) or the probability of destroying the defender
+objectives = ("ipcSwing", "victory")
+
+
+class RetreatTable:
+    """Best decision of the attacker after every round, press the attack or retreat, for every pair of
+    (attacker, defender) casualty indices (see CompiledCollection), as computed by the RetreatSolver.
+
+    press[i, j] is the decision at attacker casualty index i and defender casualty index j. The
+    expected outcomes (index 0: IPC swing, index 1: probability the defender is destroyed) of pressing
+    the attack from a state and then following the table are pressValues[:, i, j], the outcomes of
+    retreating are retreatValues[:, i, j]."""
+
+    def __init__(self, attacker: CompiledCollection, defender: CompiledCollection, objective, press, pressValues, retreatValues, startValues):
+        self.objective = objective
+        self.press = press
+        self.pressValues = pressValues
+        self.retreatValues = retreatValues
+        # Expected outcomes of the battle, whose first round is always fought
+        self.expectedIpcSwing, self.victoryProbability = (float(v) for v in startValues)
+        self.attackerHP = attacker.hp
+        self.defenderHP = defender.hp
+        self._attackerIndex = {tuple(counts): i for i, counts in enumerate(attacker.counts.tolist())}
+        self._defenderIndex = {tuple(counts): j for j, counts in enumerate(defender.counts.tolist())}
+
+    def lookup(self, attacker: UnitCollection, defender: UnitCollection):
+        """(i, j) casualty indices of the collections' current state, or None if the state isn't in the table
+        (e.g., casualties were taken off the loss priority)."""
+        i = self._attackerIndex.get(tuple(attacker._counts.asList()))
+        j = self._defenderIndex.get(tuple(defender._counts.asList()))
+        if i is None or j is None:
+            return None
+        return (i, j)
+
+    def recommend(self, attacker: UnitCollection, defender: UnitCollection):
+        """True to press the attack, False to retreat, None if the state isn't in the table."""
+        state = self.lookup(attacker, defender)
+        return None if state is None else bool(self.press[state])
+
+    def advice(self, attacker: UnitCollection, defender: UnitCollection):
+        """The recommendation for the collections' current state as a sentence, None if the state isn't in the table."""
+        state = self.lookup(attacker, defender)
+        if state is None:
+            return None
+        i, j = state
+        return (
+            f"Recommended: {"Press" if self.press[i, j] else "Retreat"} "
+            f"(expected IPC swing {self.pressValues[0, i, j]:.2f} when pressing, {self.retreatValues[0, i, j]:.2f} when retreating; "
+            f"{self.pressValues[1, i, j]:.1%} chance to destroy the defender when pressing)"
+        )
+
+    def toDataFrame(self):
+        """Decision and expected outcomes of every state where both sides have units left."""
+        import pandas as pd
+
+        rows = []
+        for i, attackerHP in enumerate(self.attackerHP):
+            for j, defenderHP in enumerate(self.defenderHP):
+                if attackerHP == 0 or defenderHP == 0:
+                    continue
+                rows.append(
+                    [
+                        attackerHP,
+                        defenderHP,
+                        "Press" if self.press[i, j] else "Retreat",
+                        self.pressValues[0, i, j],
+                        self.retreatValues[0, i, j],
+                        self.pressValues[1, i, j],
+                    ]
+                )
+        columns = ["Attacker HP", "Defender HP", "Decision", "Press IPC Swing", "Retreat IPC Swing", "Press Victory Probability"]
+        return pd.DataFrame(rows, columns=columns)
+
+    def PrintTable(self):
+        """Print the decisions as a grid with a row per attacker HP and a column per defender HP
+        (P: press, R: retreat, .: the battle is over)."""
+        print(f"Expected IPC swing (Attacker): {self.expectedIpcSwing:.2f}, defender destroyed: {self.victoryProbability:.2%}")
+        print("Attacker HP \\ Defender HP: " + " ".join(f"{hp:>2}" for hp in self.defenderHP))
+        for i, attackerHP in enumerate(self.attackerHP):
+            cells = []
+            for j, defenderHP in enumerate(self.defenderHP):
+                cells.append(" ." if attackerHP == 0 or defenderHP == 0 else (" P" if self.press[i, j] else " R"))
+            print(f"{attackerHP:>26}: " + " ".join(cells))
+
+
+class RetreatSolver:
+    """Solves the attacker's retreat decisions exactly, as a Markov decision process over (attacker, defender)
+    casualty indices: after every round the attacker either retreats, ending the battle in its current state,
+    or fights another round, whose outcome distribution is the MarkovSolver's round transition.
+
+    Casualty indices never decrease, so the states are solved backwards in a single pass, every state from
+    the states a round can lead to. Rounds where nobody scores a hit are folded in by rescaling, since the
+    attacker faces the same decision again after them. Like the MarkovSolver, this requires a matchup where
+    every hit can be applied to the next unit in the loss priority."""
+
+    def __init__(self, objective="ipcSwing"):
+        if objective not in objectives:
+            raise ValueError(f"Unknown objective {objective} (use one of {", ".join(objectives)})")
+        self.objective = objective
+        self._solver = MarkovSolver()
+
+    def solve(self, attacker: CompiledCollection, defender: CompiledCollection) -> RetreatTable:
+        attacker.checkTargets(defender)
+        defender.checkTargets(attacker)
+        swing = (attacker.cost[:, None] - attacker.cost[0]) - (defender.cost[None, :] - defender.cost[0])
+        victory = (attacker.hp[:, None] > 0) & (defender.hp[None, :] == 0)
+        retreatValues = np.stack([swing.astype(float), np.zeros(swing.shape)])
+        # Outcomes of every state when following the table (a finished battle's outcomes are final)
+        values = np.stack([swing.astype(float), victory.astype(float)])
+        pressValues = values.copy()
+        press = np.zeros(swing.shape, dtype=bool)
+        k = objectives.index(self.objective)
+
+        for i in range(attacker.maxIndex, -1, -1):
+            for j in range(defender.maxIndex, -1, -1):
+                if attacker.hp[i] == 0 or defender.hp[j] == 0:
+                    continue
+                transition = self._solver._transition(attacker, defender, i, j)
+                stay = transition[0, 0]
+                if stay < 1:
+                    # values[:, i, j] isn't solved yet, the rescaling accounts for rounds without hits
+                    moved = transition.copy()
+                    moved[0, 0] = 0
+                    pressValues[:, i, j] = (values[:, i:, j:] * moved).sum(axis=(1, 2)) / (1 - stay)
+                else:
+                    pressValues[:, i, j] = retreatValues[:, i, j]  # Neither side can score a hit
+                # Ties are broken in favour of pressing the attack
+                press[i, j] = pressValues[k, i, j] >= retreatValues[k, i, j]
+                values[:, i, j] = pressValues[:, i, j] if press[i, j] else retreatValues[:, i, j]
+
+        # The attacker can only retreat after the first round
+        startValues = values[:, 0, 0]
+        if attacker.hp[0] > 0 and defender.hp[0] > 0:
+            transition = self._solver._transition(attacker, defender, 0, 0)
+            startValues = (values * transition).sum(axis=(1, 2))
+        return RetreatTable(attacker, defender, self.objective, press, pressValues, retreatValues, startValues)
+
+
+class RetreatTablePolicy(BattlePolicy):
+    """Battle policy that presses the attack or retreats as the retreat table recommends (and presses the attack
+    in states that aren't in the table)."""
+
+    def __init__(self, table: RetreatTable, casualtyPolicy=None):
+        super().__init__(casualtyPolicy)
+        self.table = table
+
+    def pressAttack(self, round: int, attacker: UnitCollection, defender: UnitCollection):
+        return self.table.recommend(attacker, defender) is not False
+
+
+class Inputs:
+    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print when the attacker should retreat from a battle.")
+    inputs = Inputs()
+    parser.add_argument("attacker", help="Unit list of the attacker")
+    parser.add_argument("defender", help="Unit list of the defender")
+    parser.add_argument("profile")
+    parser.add_argument("-d", "--defender-profile", dest="defenderProfile", help="Profile of the defender (default: profile)")
+    parser.add_argument("-o", "--objective", choices=objectives, default="ipcSwing", help="What the decisions maximize")
+    parser.parse_args(namespace=inputs)
+
+    profile = Registry.getProfile(inputs.profile)
+    defenderProfile = profile if inputs.defenderProfile is None else Registry.getProfile(inputs.defenderProfile)
+    attacker = CompiledCollection(UnitCollection(Registry.getUnitList(inputs.attacker), profile))
+    defender = CompiledCollection(UnitCollection(Registry.getUnitList(inputs.defender), defenderProfile))
+    RetreatSolver(inputs.objective).solve(attacker, defender).PrintTable()
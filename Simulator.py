@@ -4,18 +4,19 @@ from colorama import Fore
 from colorama import init as colorama_init
 import argparse
 import os
+from Hit import HitCounts
 from UnitCollection import UnitCollection
+from BattleEngine import BattleEngine, BattlePolicy
+from CasualtyPolicy import CasualtyPolicy, LossPriorityPolicy, casualtyPolicies
+from BattleStats import BattleStats, PrecisionTarget, RoundStats
 from Units import *
-import pandas as pd
-from statistics import mean, median
 from Resources import bcolors
 import sys
-from tabulate import tabulate
-from UI_UnitSelector import GetUnitList, Combatant
-from UI_CasualtySelector import GetUnitCasualties
-import tkinter as tk
-from tkinter import messagebox
 from Config import Config
+from Dice import DiceRoller
+from Profiling import BattleProfiler
+from UnitCounts import UnitCounts
+import Registry
 
 def center_window_left_half(window):
     """Center the window in the left half of the screen"""
@@ -37,7 +38,7 @@ def center_window_left_half(window):
     # Set window position
     window.geometry(f"+{x}+{y}")
 
-unitListsFile = "unitLists.csv"
+from Registry import unitListsFile
 from UnitsEnum import Units
 
 UnitUIMap = {
@@ -74,6 +75,68 @@ class Fmt:
     DefenderHead = f"{defHead}Defender{Style.RESET_ALL}"
 
 
+class DialogCasualtyPolicy(CasualtyPolicy):
+    """Casualties are selected by the user in the casualty dialog whenever there is a choice
+    (see Simulator._getCasualties)."""
+
+    def __init__(self, simulator, isLand: bool = True):
+        self.simulator = simulator
+        self.isLand = isLand
+
+    def choose(self, victim: UnitCollection, aggressor: UnitCollection, hits: HitCounts, side: str):
+        return self.simulator._getCasualties(victim, aggressor, len(hits), self.isLand, side)
+
+    def apply(self, victim: UnitCollection, casualties):
+        victim.reloadUnitsFromDict(casualties)
+
+
+class InteractivePolicy(BattlePolicy):
+    """Battle policy for the interactive simulator. Rolls and battle state are printed to the
+    terminal, casualties are selected through the casualty dialog (unless another casualty
+    policy is given) and the user is asked whether to press the attack after each round."""
+
+    def __init__(self, simulator, isLand: bool = True, casualtyPolicy: CasualtyPolicy = None, retreatTable: "RetreatTable" = None):
+        super().__init__(DialogCasualtyPolicy(simulator, isLand) if casualtyPolicy is None else casualtyPolicy)
+        self.simulator = simulator
+        self.isLand = isLand
+        self.rollObserver = printRolls
+        # Recommendations shown when asking whether to press the attack
+        self.retreatTable = retreatTable
+
+    def pressAttack(self, round: int, attacker: UnitCollection, defender: UnitCollection):
+        message = "Would you like to press the attack or retreat?"
+        advice = None if self.retreatTable is None else self.retreatTable.advice(attacker, defender)
+        if advice is not None:
+            message += f"\n\n{advice}"
+            if isinstance(self.casualtyPolicy, DialogCasualtyPolicy):
+                message += "\n(Assumes the remaining casualties follow the loss priority)"
+        userInput = self.simulator.custom_message_box("Press the attack?", message, "Press", "Retreat")
+        return userInput == "Press"
+
+    def roundStarted(self, round: int):
+        os.system("cls")
+
+    def phaseStarted(self, round: int, side: str, isFirstStrike: bool):
+        label = Fmt.Attacker if side == "Attacker" else Fmt.Defender
+        if isFirstStrike:
+            print(f"{label} Submarines:")
+            return
+        if side == "Attacker":
+            print(f"Round {bcolors.RED}{round}{bcolors.ENDC}")
+            print("\u2550" * 40)
+        print(f"{Fmt.AttackerHead if side == "Attacker" else Fmt.DefenderHead}")
+
+    def phaseFinished(self, round: int, side: str, isFirstStrike: bool, hitCount: int):
+        if isFirstStrike:
+            print()
+            return
+        label = Fmt.Attacker if side == "Attacker" else Fmt.Defender
+        print(f"{label} Hits: {hitCount}\n")
+
+    def roundFinished(self, round: int, attacker: UnitCollection, defender: UnitCollection, attackerHitCount: int, defenderHitCount: int):
+        self.simulator.PrintBattleState(round, attacker, defender, attackerHitCount, defenderHitCount)
+
+
 class Simulator:
 
     def SimulateBattle(
@@ -82,90 +145,38 @@ class Simulator:
         maxRounds=-1,
         printOutcome=False,
         printBattle=False,
-        isLand:bool=True
+        isLand:bool=True,
+        seed=None,
+        profiler: BattleProfiler = None,
+        casualtyPolicy: CasualtyPolicy = None,
     ):
-        maxRounds = sys.maxsize if maxRounds < 0 else maxRounds
-        self.attacker.reset()
-        self.defender.reset()
-        round = 0
+        """Fight a single battle. A printed battle selects casualties in the casualty dialog, unless
+        a casualty policy is given (see CasualtyPolicy), and recommends when to retreat if the
+        matchup can be solved exactly (see RetreatSolver) and casualties are selected in the dialog
+        or follow the loss priority."""
         if printBattle:
             print(f"{bcolors.BOLD}{bcolors.GREEN}Battle Rounds{bcolors.ENDC}")
             print("\u2550" * 50)
-        retreat = False
-        while (
-            self.attacker.currHP() > 0
-            and self.defender.currHP() > 0
-            and not retreat
-            and round < maxRounds
-        ):
-            os.system("cls")
-            attackerHitCount, defenderHitCount = (0, 0)
-            round += 1
-            # First Strike Phase
-            if self.attacker.CanFirstStrike(defender):
-                print(f"{Fmt.Attacker} Submarines:")
-                attackerHits = self.attacker.firstStrikeAttack(self.defender)
-                attackerHitCount += len(attackerHits)
-                defUnits = self._getCasualties(self.defender, self.attacker, len(attackerHits), isLand, "Defender")
-                print()
-
-            if self.defender.CanFirstStrike(attacker):
-                print(f"{Fmt.Defender} Submarines:")
-                defenderHits = self.defender.firstStrikeDefend(self.attacker)
-                defenderHitCount += len(defenderHits)
-                attUnits = self._getCasualties(self.attacker, self.defender, len(defenderHits), isLand,"Attacker")
-                print()
-
-            if self.attacker.CanFirstStrike(defender):
-                self.defender.reloadUnitsFromDict(defUnits)
-
-            if self.defender.CanFirstStrike(attacker):
-                self.attacker.reloadUnitsFromDict(attUnits)
-
-            # General Combat Phase
-            if printBattle:
-                print(f"Round {bcolors.RED}{round}{bcolors.ENDC}")
-                print("\u2550" * 40)
-                print(f"{Fmt.AttackerHead}")
-            attackerHits = self.attacker.attack()
-            attackerHitCount += len(attackerHits)
-            if printBattle:
-                print(f"{Fmt.Attacker} Hits: {attackerHitCount}\n")
-            # Assign hits to defender
-            defUnits = self._getCasualties(self.defender, self.attacker, len(attackerHits),isLand,"Defender")
-
-            print(f"{Fmt.DefenderHead}")
-            defenderHits = self.defender.defend()
-            defenderHitCount += len(defenderHits)
-            if printBattle:
-                print(f"{Fmt.Defender} Hits: {defenderHitCount}\n")
-            # Assign hits to attacker
-            attUnits = self._getCasualties(self.attacker, self.defender, len(defenderHits),isLand,"Attacker")
-
-            self.attacker.reloadUnitsFromDict(attUnits)
-            self.defender.reloadUnitsFromDict(defUnits)
-
-            retreat = self.attacker.currHP() <= retreatThreshold
-
-            if printBattle:
-                self.PrintBattleState(
-                    round,
-                    self.attacker,
-                    self.defender,
-                    attackerHitCount,
-                    defenderHitCount,
-                )
-                if (
-                    not retreat
-                    and self.attacker.currHP() > 0
-                    and self.defender.currHP() > 0
-                ):
-                    userInput = self.custom_message_box("Press the attack?","Would you like to press the attack or retreat?", "Press", "Retreat")
-                    retreat = retreat if userInput == "Press" else True
+            retreatTable = None
+            # The table assumes casualties follow the loss priority. Casualties selected in the dialog may not,
+            # so its advice is labelled as assuming they will (see InteractivePolicy.pressAttack)
+            if casualtyPolicy is None or isinstance(casualtyPolicy, LossPriorityPolicy):
+                from CompiledCollection import CompiledCollection
+                from RetreatSolver import RetreatSolver
+
+                try:
+                    retreatTable = RetreatSolver().solve(CompiledCollection(self.attacker), CompiledCollection(self.defender))
+                except ValueError:
+                    pass  # Target restrictions (e.g., submarines), no recommendations
+            policy = InteractivePolicy(self, isLand, casualtyPolicy, retreatTable)
+        else:
+            policy = BattlePolicy(casualtyPolicy)
+        engine = BattleEngine(retreatThreshold, maxRounds, rng=DiceRoller(seed), profiler=profiler)
+        result = engine.run(self.attacker, self.defender, policy)
 
         if printOutcome:
             self.PrintBattleOutcome()
-        return (self.attacker.currHP(), self.defender.currHP())
+        return (result.attackerHP, result.defenderHP)
 
     def manuallySelectCasualties(self, victim:UnitCollection, aggressor:UnitCollection):
         # If we're applying submarine hits, then they cannot go to aircraft, so we need to manually handle that.
@@ -180,6 +191,8 @@ class Simulator:
 
     # A bunch of extra work just for a fancy message box...
     def custom_message_box(self, title, message, button1_text="Yes", button2_text="No"):
+        import tkinter as tk
+
         result = {"value": None}
         inputRoot = tk.Tk()
         inputRoot.withdraw()
@@ -218,6 +231,8 @@ class Simulator:
         return result["value"]
 
     def _getCasualties(self, victim:UnitCollection, aggressor:UnitCollection, numHits:int, isLand:bool, side:str):
+            from UI_CasualtySelector import GetUnitCasualties
+
             manualMode = self.manuallySelectCasualties(victim, aggressor)
             unitDict = victim.generateUnitDict(isLand=isLand)
             subPresent = not isLand and unitDict["submarine"] > 0
@@ -229,27 +244,6 @@ class Simulator:
             
             return unitDict
 
-    def _getRoundStats(
-        self,
-        round: int,
-        attackerExpectedHits: float,
-        defenderExpectedHits: float,
-        attackerHitCount: int,
-        defenderHitCount: int,
-    ):
-        dataRow = [
-            round,
-            self.attacker.currHP(),
-            self.attacker.currCost(),
-            attackerExpectedHits,
-            attackerHitCount,
-            self.defender.currHP(),
-            self.defender.currCost(),
-            defenderExpectedHits,
-            defenderHitCount,
-        ]
-        return dataRow
-
     def PrintBattleState(
         self, round, attacker: UnitCollection, defender: UnitCollection, aH, dH
     ):
@@ -276,25 +270,33 @@ class Simulator:
         )
 
     def LoadUnitCollection(listName, profileName):
-        profile = pd.read_csv(
-            f"UnitProfiles_{profileName}.csv", encoding="utf-8", delimiter=","
-        )
-        unitList = pd.read_csv(unitListsFile, encoding="utf-8", delimiter=",")
-
-        units = UnitCollection(unitList[["Key", listName]], profile)
+        unitList = Registry.getUnitList(listName, unitListsFile)
+        units = UnitCollection(unitList, Registry.getProfile(profileName))
         return units
 
-    def LoadUnitCollectionFromUI(combatant: Combatant, profileName):
-        headers = ["Key", "ListName"]
-        unitList = combatant.units
-        units = [[UnitUIMap[unit].value, val] for unit, val in unitList.items()]
-        unitList = pd.DataFrame(units, columns=headers)
-        profile = pd.read_csv(
-            f"UnitProfiles_{profileName}.csv", encoding="utf-8", delimiter=","
-        )
-        units = UnitCollection(unitList, profile, combatant.power)
+    def LoadUnitCollectionFromUI(combatant: "Combatant", profileName):
+        unitList = UnitCounts()
+        for unit, val in combatant.units.items():
+            unitList.add(UnitUIMap[unit], int(val))
+        units = UnitCollection(unitList, Registry.getProfile(profileName), combatant.power)
         return units
 
+    def GenerateHitCurves(curveInputFile="Input_Curves.csv"):
+        """Hit curves (see UnitCollection.generateHitCurve) of every collection in the input table, which has
+        a unit list, profile and is attack column (e.g., Input_Curves.csv). Returns the curves side by side,
+        indexed by HP lost."""
+        import pandas as pd
+
+        curveInputs = pd.read_csv(curveInputFile, encoding="utf-8", delimiter="\t")
+        curves = {}
+        for index, row in curveInputs.iterrows():
+            listName, profileName, isAttack = row.iloc[0], row.iloc[1], bool(row.iloc[2])
+            units = Simulator.LoadUnitCollection(listName, profileName)
+            curve = units.generateHitCurve(isAttack)
+            label = f"{listName} ({profileName}, {"Attack" if isAttack else "Defense"})"
+            curves[label] = curve.set_index("HP Lost")["Expected Hits"]
+        return pd.DataFrame(curves)
+
     def LoadAttacker(self, listName, profileName):
         self.attacker = Simulator.LoadUnitCollection(listName, profileName)
 
@@ -305,32 +307,129 @@ class Simulator:
         self.attacker.reset()
         self.defender.reset()
 
-    def GenerateBattleStats(self, battleCount=10000):
-        resultArr = []
+    def GenerateBattleStats(
+        self,
+        battleCount=10000,
+        workers=1,
+        seed=None,
+        profiler: BattleProfiler = None,
+        cache: "OddsCache" = None,
+        casualtyPolicy: CasualtyPolicy = None,
+    ):
+        """Simulate battleCount battles and print the outcome statistics. With more than one worker the
+        battles are split over a process pool (see ParallelBattles.runBattles); results are
+        reproducible for a given seed and worker count. A profiler records where the time of the
+        battles goes (see Profiling.BattleProfiler). With a cache, the stats of a matchup that was
+        already simulated are read from it instead (profiled runs always fight their battles).
+        Casualties follow the casualty policy (by default, the collections' loss priorities)."""
+        if profiler is not None and workers > 1:
+            raise ValueError("Battles can only be profiled in a single process (workers=1)")
+        self.reset()
+        engine = BattleEngine(profiler=profiler, casualtyPolicy=casualtyPolicy)
+        if cache is None or profiler is not None:
+            stats = self._runBattles(engine, BattleStats, battleCount, workers, seed)
+        else:
+            from OddsCache import matchupKey
+
+            key = matchupKey(self.attacker, self.defender, engine, battleCount, workers, seed)
+            stats = cache.getOrRun(key, lambda: self._runBattles(engine, BattleStats, battleCount, workers, seed))
+        Simulator.PrintVictoryData(stats.attackerWinRate, stats.toDataFrame())
+
+    def GenerateAdaptiveBattleStats(self, target: PrecisionTarget = None, batchSize=1000, maxBattles=100000, workers=1, seed=None):
+        """Like GenerateBattleStats, but fights battles in batches until the win rate and IPC swing are known
+        to the target precision (by default ±0.5% and ±0.5 IPC at 95% confidence, see PrecisionTarget)
+        and also prints the achieved confidence intervals and the number of battles fought."""
+        from ParallelBattles import runUntilPrecise
+
+        target = PrecisionTarget() if target is None else target
         self.reset()
-        for i in range(battleCount):
-            (a, d) = self.SimulateBattle()
-            attackerWon = 1 if a > d else 0
-            tuvSwing = self.attacker.valueDelta() - self.defender.valueDelta()
-            results = [attackerWon, a, d, tuvSwing]
-            resultArr.append(results)
-            self.attacker.reset()
-            self.defender.reset()
-        resultDf = pd.DataFrame(
-            resultArr,
-            columns=[
-                "Attacker Won",
-                "Remainder Attacker",
-                "Remainder Defender",
-                "Average IPC Swing (Attacker)",
-            ],
+        stats = runUntilPrecise(self.attacker, self.defender, target, BattleEngine(), batchSize, maxBattles, workers, seed)
+        Simulator.PrintVictoryData(stats.attackerWinRate, stats.toDataFrame())
+        Simulator.PrintPrecision(stats, target)
+        return stats
+
+    def PrintPrecision(stats: BattleStats, target: PrecisionTarget):
+        winLow, winHigh = stats.winRateInterval(target.confidence)
+        swingLow, swingHigh = stats.ipcSwingInterval(target.confidence)
+        status = "" if target.isMet(stats) else f" {Fore.RED}(target precision not reached){Style.RESET_ALL}"
+        print(f"Battles fought: {stats.battleCount}{status}")
+        print(f"Attacker win rate ({target.confidence:.0%} confidence): {winLow:.2%} to {winHigh:.2%}")
+        print(f"IPC swing (Attacker) ({target.confidence:.0%} confidence): {swingLow:.2f} to {swingHigh:.2f}\n")
+
+    def _runBattles(self, engine: BattleEngine, statsType, battleCount, workers=1, seed=None):
+        from ParallelBattles import chunkSeeds, fightBattles, runBattles
+
+        if workers > 1:
+            return runBattles(self.attacker, self.defender, battleCount, statsType, engine, workers, seed)
+        stats = fightBattles(self.attacker, self.defender, engine, statsType(), battleCount, chunkSeeds(seed, 1)[0])
+        return stats
+
+    def GenerateBatchBattleStats(self, battleCount=10000, seed=None):
+        """Equivalent of GenerateBattleStats that fights all battles in lockstep with the BatchEngine.
+        Only supports matchups where every hit can be taken by any unit (see CompiledCollection)."""
+        from BatchEngine import BatchEngine
+        from CompiledCollection import CompiledCollection
+
+        attacker = CompiledCollection(self.attacker)
+        defender = CompiledCollection(self.defender)
+        result = BatchEngine(seed=seed).run(attacker, defender, battleCount)
+        Simulator.PrintBattleStats(result.toDataFrame())
+
+    def GenerateExactBattleStats(self, retreatThreshold=0, maxRounds=-1):
+        """Exact counterpart of GenerateBattleStats computed with the MarkovSolver. Returns the BattleOdds."""
+        from CompiledCollection import CompiledCollection
+        from MarkovSolver import MarkovSolver
+
+        attacker = CompiledCollection(self.attacker)
+        defender = CompiledCollection(self.defender)
+        odds = MarkovSolver(retreatThreshold, maxRounds).solve(attacker, defender)
+        Simulator.PrintBattleOdds(odds)
+        return odds
+
+    def GenerateRetreatTable(self, objective="ipcSwing"):
+        """Print when the attacker should retreat to maximize the expected IPC swing (or the probability of
+        destroying the defender) and return the RetreatTable. Only supports matchups where every hit can
+        be taken by any unit (see CompiledCollection)."""
+        from CompiledCollection import CompiledCollection
+        from RetreatSolver import RetreatSolver
+
+        attacker = CompiledCollection(self.attacker)
+        defender = CompiledCollection(self.defender)
+        table = RetreatSolver(objective).solve(attacker, defender)
+        table.PrintTable()
+        return table
+
+    def PrintBattleOdds(odds: "BattleOdds"):
+        from tabulate import tabulate
+
+        print(
+            f"Attacker wins {Fore.RED}{odds.attackerWinProbability:2.2%}{
+              Style.RESET_ALL} percent of the time."
         )
-        attackWinRate = resultDf["Attacker Won"].mean()
+        victoryArr = [["Attacker Won", "Units Remaining", "Average IPC Swing (Attacker)"]]
+        for attackerWon in (False, True):
+            means = odds.conditionalMeans(attackerWon)
+            if means is None:
+                continue
+            unitsRemaining = max(means["Remainder Attacker"], means["Remainder Defender"])
+            victoryArr.append([int(attackerWon), unitsRemaining, means["Average IPC Swing (Attacker)"]])
+        print(tabulate(victoryArr, headers="firstrow", tablefmt="fancy_grid"))
+        print(
+            f"{Fore.LIGHTMAGENTA_EX}Expected IPC Swing (Attacker):{
+              Style.RESET_ALL} {odds.expectedIpcSwing:.2f}\n"
+        )
+
+    def PrintBattleStats(resultDf: "pd.DataFrame"):
+        Simulator.PrintVictoryData(resultDf["Attacker Won"].mean(), resultDf.groupby("Attacker Won").mean())
+
+    def PrintVictoryData(attackWinRate, victoryData: "pd.DataFrame"):
+        """Print the win rate and the mean outcomes grouped by "Attacker Won"."""
+        from tabulate import tabulate
+
         print(
             f"Attacker wins {Fore.RED}{attackWinRate:2.2%}{
               Style.RESET_ALL} percent of the time."
         )
-        victoryData = resultDf.groupby("Attacker Won").mean()
         # victoryData = victoryData.set_axis(
         #     ["Defender Won", "Attacker Won"], axis='index')
         victoryData["Units Remaining"] = victoryData[
@@ -340,70 +439,16 @@ class Simulator:
         print(tabulate(victoryData, headers="keys", tablefmt="fancy_grid"))
         print()
 
-    def GenerateExtendedBattleStats(self, battleCount=2000):
-        resultArr = []
+    def GenerateExtendedBattleStats(self, battleCount=2000, workers=1, seed=None):
+        """Simulate battleCount battles and write the mean (and standard deviation) of the battle state
+        after every round, per number of rounds the battle lasted (tmp.csv) and per round (tmp2.csv)."""
         self.reset()
-        roundStats = []
-        for i in range(battleCount):
-            runStats = self.SimulateBattleWithStats()
-            maxRound = len(runStats) - 1
-            for i in runStats:
-                i.append(maxRound)
-            roundStats.extend(runStats)
-            a = self.attacker.currHP()
-            d = self.defender.currHP()
-            attackerWon = 1 if a > d else 0
-            tuvSwing = self.attacker.valueDelta() - self.defender.valueDelta()
-            results = [attackerWon, a, d, tuvSwing]
-            resultArr.append(results)
-        headers = [
-            "Round",
-            "Attacker HP",
-            "Attacker TUV",
-            "Attacker Expected Hits",
-            "Attacker Actual Hits",
-            "Defender HP",
-            "Defender TUV",
-            "Defender Expected Hits",
-            "Defender Actual Hits",
-            "Max Rounds",
-        ]
-        roundsDf = pd.DataFrame(roundStats, columns=headers)
+        roundStats = self._runBattles(BattleEngine(recordRounds=True), RoundStats, battleCount, workers, seed)
         # Granular Analysis
-        groupedDf = roundsDf.groupby(["Max Rounds", "Round"]).aggregate(
-            {
-                "Round": "size",
-                "Attacker HP": "mean",
-                "Attacker TUV": "mean",
-                "Attacker Expected Hits": "mean",
-                "Attacker Actual Hits": "mean",
-                "Defender HP": "mean",
-                "Defender TUV": "mean",
-                "Defender Expected Hits": "mean",
-                "Defender Actual Hits": "mean",
-            }
-        )
-        groupedDf.rename(columns={"Round": "Count"}, inplace=True)
-        groupedDf.reset_index()
-        groupedDf.to_csv("tmp.csv", sep="\t")
+        roundStats.toDataFrame(byMaxRound=True).to_csv("tmp.csv", sep="\t")
 
         # Group by round
-        groupedDf = roundsDf.groupby(["Round"]).aggregate(
-            {
-                "Round": "size",
-                "Attacker HP": "mean",
-                "Attacker TUV": "mean",
-                "Attacker Expected Hits": "mean",
-                "Attacker Actual Hits": "mean",
-                "Defender HP": "mean",
-                "Defender TUV": "mean",
-                "Defender Expected Hits": "mean",
-                "Defender Actual Hits": "mean",
-            }
-        )
-        groupedDf.rename(columns={"Round": "Count"}, inplace=True)
-        groupedDf.reset_index()
-        groupedDf.to_csv("tmp2.csv", sep="\t")
+        roundStats.toDataFrame().to_csv("tmp2.csv", sep="\t")
 
     def swapPlaces(attacker, defender):
         return (defender, attacker)
@@ -413,7 +458,10 @@ class Simulator:
         at_lossProfile=UnitCollection.defaultLossPriority,
         df_lossProfile=UnitCollection.defaultLossPriority,
         simCount=1000,
+        target: PrecisionTarget = None,
     ):
+        """Fight and print a single battle, then the statistics of simCount battles (or, with a target
+        precision, of as many battles as it takes to reach it)."""
         # self.LoadAttacker(at, at_profile)
         # self.LoadDefender(df, df_profile)
         self.attacker.defineLossPriority(at_lossProfile)
@@ -422,7 +470,10 @@ class Simulator:
         self.SimulateBattle(printBattle=True, printOutcome=True)
 
         print(f"{Fmt.genHead}Statistics{Style.RESET_ALL}\n")
-        self.GenerateBattleStats(simCount)
+        if target is not None:
+            self.GenerateAdaptiveBattleStats(target)
+        else:
+            self.GenerateBattleStats(simCount)
 
 
 class Inputs:
@@ -450,9 +501,14 @@ def RunSingSimulation():
 
 
 if __name__ == "__main__":
+    from UI_UnitSelector import GetUnitList
+
     parser = argparse.ArgumentParser()
     inputs = Inputs()
     parser.add_argument("isLand")
+    parser.add_argument(
+        "-c", "--casualties", choices=["dialog"] + list(casualtyPolicies), default="dialog", help="How casualties are selected"
+    )
     parser.parse_args(namespace=inputs)
     isLand = True if int(inputs.isLand) == 1 else False
     lists = GetUnitList(isLand=isLand)
@@ -463,4 +519,5 @@ if __name__ == "__main__":
     sim = Simulator()
     sim.attacker = attacker
     sim.defender = defender
-    sim.SimulateBattle(printBattle=True, printOutcome=True,isLand=isLand)
+    casualtyPolicy = None if inputs.casualties == "dialog" else casualtyPolicies[inputs.casualties]()
+    sim.SimulateBattle(printBattle=True, printOutcome=True, isLand=isLand, casualtyPolicy=casualtyPolicy)
@@ -0,0 +1,103 @@
+import argparse
+import os
+from BattleEngine import BattleEngine
+from BattleStats import BattleStats
+from OddsCache import OddsCache, matchupKey
+from ParallelBattles import chunkSeeds, fightBattles
+from UnitCollection import UnitCollection
+import Registry
+from Registry import unitListsFile
+
+# Columns of a matchup table (e.g., Input.csv, Input2.csv or BattleForRussia.csv)
+matchupColumns = ["Attacker List", "Attacker Profile", "Defender List", "Defender Profile"]
+
+
+class CollectionLoader:
+    """Loads unit collections, building each (unit list, profile) collection only once."""
+
+    def __init__(self, unitListsFile=unitListsFile):
+        self.unitListsFile = unitListsFile
+        self.collections = {}
+
+    def load(self, listName, profileName):
+        key = (listName, profileName)
+        if key not in self.collections:
+            unitList = Registry.getUnitList(listName, self.unitListsFile)
+            self.collections[key] = UnitCollection(unitList, Registry.getProfile(profileName))
+        return self.collections[key]
+
+
+def _runMatchup(attacker: UnitCollection, defender: UnitCollection, battleCount: int, seed: int):
+    return fightBattles(attacker, defender, BattleEngine(), BattleStats(), battleCount, seed)
+
+
+def runSweep(
+    matchups: "pd.DataFrame", battleCount=10000, workers=1, seed=None, loader: CollectionLoader = None, cache: OddsCache = None
+):
+    """Simulate every matchup of the table and return it with the battle stats of each row added.
+
+    Identical matchups are only simulated once. The matchups are spread over a pool of worker
+    processes, each one fights all battles of its matchup. With a seed, every matchup rolls the
+    dice Simulator.GenerateBattleStats rolls for that seed, so a matchup's results only depend on
+    the seed and the matchup (not on the other rows or their order). With a cache, matchups it
+    already holds (for the same seed, or unseeded) aren't simulated again and the new ones are
+    added to it."""
+    from concurrent.futures import ProcessPoolExecutor
+    import pandas as pd
+
+    loader = CollectionLoader() if loader is None else loader
+    keys = [tuple(row) for row in matchups[matchupColumns].itertuples(index=False)]
+    uniqueKeys = list(dict.fromkeys(keys))
+    # The same seed as a single worker GenerateBattleStats run, unseeded runs get independent random seeds
+    matchupSeeds = chunkSeeds(None, len(uniqueKeys)) if seed is None else [chunkSeeds(seed, 1)[0]] * len(uniqueKeys)
+    tasks = [
+        (loader.load(aList, aProfile), loader.load(dList, dProfile), battleCount, matchupSeed)
+        for (aList, aProfile, dList, dProfile), matchupSeed in zip(uniqueKeys, matchupSeeds)
+    ]
+    results = {}
+    if cache is not None:
+        # Every matchup is fought in a single process, so the key doesn't depend on the worker count
+        cacheKeys = {key: matchupKey(a, d, BattleEngine(), n, 1, seed) for key, (a, d, n, _) in zip(uniqueKeys, tasks)}
+        for key in uniqueKeys:
+            stats = cache.get(cacheKeys[key])
+            if stats is not None:
+                results[key] = stats
+    missing = [(key, task) for key, task in zip(uniqueKeys, tasks) if key not in results]
+    if len(missing) > 0:
+        missingKeys, missingTasks = zip(*missing)
+        if workers > 1 and len(missingTasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(missingTasks))) as pool:
+                statsList = list(pool.map(_runMatchup, *zip(*missingTasks)))
+        else:
+            statsList = [_runMatchup(*task) for task in missingTasks]
+        for key, stats in zip(missingKeys, statsList):
+            results[key] = stats
+            if cache is not None:
+                cache.put(cacheKeys[key], stats)
+
+    statsDf = pd.DataFrame([results[key].summary() for key in keys], index=matchups.index)
+    return pd.concat([matchups, statsDf], axis=1)
+
+
+class Inputs:
+    pass
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Simulate every matchup of a matchup table.")
+    inputs = Inputs()
+    parser.add_argument("matchupFile", help="Tab separated table with the columns " + ", ".join(matchupColumns))
+    parser.add_argument("-o", "--output", default="SweepResults.csv", help="Tab separated result table")
+    parser.add_argument("-n", "--battles", type=int, default=10000, help="Battles per matchup")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-s", "--seed", type=int, default=None)
+    parser.add_argument("-c", "--cache", help="SQLite file to read and store the stats of the matchups")
+    parser.parse_args(namespace=inputs)
+
+    matchups = pd.read_csv(inputs.matchupFile, encoding="utf-8", delimiter="\t")
+    cache = OddsCache(inputs.cache) if inputs.cache else None
+    resultDf = runSweep(matchups, inputs.battles, inputs.workers, inputs.seed, cache=cache)
+    resultDf.to_csv(inputs.output, sep="\t", index=False)
+    print(resultDf.to_string(index=False))
@@ -2,7 +2,8 @@ import tkinter as tk
 from tkinter import messagebox
 import os
 from PIL import Image, ImageTk
-from Simulator import Simulator,GetUnitList
+from Simulator import Simulator
+from UI_UnitSelector import GetUnitList
 from UnitCollection import UnitCollection
 from subprocess import Popen
 
@@ -3,20 +3,16 @@ import math
 from Units import *
 from itertools import cycle, filterfalse, count
 from collections import Counter
-from statistics import mean, median
-import pandas as pd
 from UnitsEnum import Units
-from tabulate import tabulate
-from Hit import Hit
-from Resources import bcolors
-from dyce import H
+from Hit import HitCategory, HitCounts, hitCategory, isValidTarget
+from UnitCounts import UnitCounts
+from Registry import UnitProfile, comboSeparator
+import Profiling
+from Dice import DiceRoller, hitOutcomes, hitProbability, hitDistribution
+import numpy as np
 import json
-from matplotlib import pyplot as plt
 from TechMapping import *
 
-# This is just to keep pandas from complaining
-pd.set_option("future.no_silent_downcasting", True)
-
 UnitUIMap = {
     "infantry": Units.Infantry,
     "mech_infantry": Units.MechInfantry,
@@ -68,8 +64,45 @@ unitDict = {
     Units.MechInfTank: MechInfTank,
 }
 
+# Reverse lookup of unitDict (unit class -> Units enum value)
+unitEnumDict = {unitType: unitEnum for unitEnum, unitType in unitDict.items()}
+
+_instanceTypeCache = {}
+
+
+def _instanceTypes(unitType):
+    """Units enum values of every unit class that is an instance of the given class."""
+    if unitType not in _instanceTypeCache:
+        _instanceTypeCache[unitType] = [u for u in Units if issubclass(unitDict[u], unitType)]
+    return _instanceTypeCache[unitType]
+
+
+# Units enum values of the combo units (i.e., units that leave other units behind when they are lost)
+_comboUnitTypes = frozenset(u for u in Units if issubclass(unitDict[u], ComboUnit))
 
-comboSeparator = "^"
+# Hits that can't be applied following the loss priority go to the first valid target in this order
+_fallbackPriority = [unitDict[u] for u in Units]
+
+# Target eligibility matrix: validTargets[category.value][unit.value] tells whether hits of
+# the category can be applied to the unit type
+validTargets = tuple(tuple(isValidTarget(c, unitDict[u]) for u in Units) for c in HitCategory)
+
+# Category of the hits scored by each unit type (without a supporting destroyer)
+_unitHitCategories = {u: hitCategory(unitDict[u]) for u in Units}
+
+_casualtyPlanCache = {}
+
+
+def _casualtyPlan(lossPriority, category: HitCategory):
+    """Units enum values of the unit types in the loss priority that hits of the given
+    category can be applied to, in loss order. Plans are shared by every collection."""
+    key = (tuple(lossPriority), category)
+    if key not in _casualtyPlanCache:
+        targets = validTargets[category.value]
+        _casualtyPlanCache[key] = tuple(
+            unitEnumDict[unitType] for unitType in lossPriority if targets[unitEnumDict[unitType].value]
+        )
+    return _casualtyPlanCache[key]
 
 
 class UnitCollection:
@@ -104,13 +137,27 @@ class UnitCollection:
 
     # region Initialization functions
     def __init__(
-        self, unitList: pd.Series, unitProfiles: pd.DataFrame, power: str = "Neutral"
+        self,
+        unitList: "UnitCounts | pd.DataFrame",
+        unitProfiles: "UnitProfile | pd.DataFrame",
+        power: str = "Neutral",
+        techs: list[Tech] = None,
     ):
-        self._unitList = []
+        self._counts = UnitCounts()
+        self._firstStruck = UnitCounts()
+        self._prototypes = {}
+        self._unitTotals = {}
+        # Totals of the units in the collection, kept up to date as units are added and removed
+        self._hp = 0
+        self._cost = 0
+        self._attackOutcomes = 0
+        self._defenseOutcomes = 0
+        self._granularCounts = UnitCounts()
         self.unitStrengths = {}
         self.unitCosts = {}
         self.power = power
-        self.Techs = TechMapping.GetTechs(power)
+        # The techs default to the ones the power has researched
+        self.Techs = TechMapping.GetTechs(power) if techs is None else list(techs)
 
         # Call initialization functions (load units, etc.)
         self._loadUnitStrengths(unitProfiles)
@@ -118,37 +165,25 @@ class UnitCollection:
         self._loadUnits(unitList)
         self._makeComboUnits()
         self.defineLossPriority(UnitCollection.defaultLossPriority)
-        self._unitList.sort()
 
         # Record original collection state to support resets
         self.originalCost = self.currCost()
         self._originalLossPriority = self._lossPriority.copy()
-        self._originalUnitList = self._unitList.copy()
-        unitCounter = Counter(type(obj) for obj in self._getGranularUnitList())
-        unitArr = [["Unit", "Count"]]
-        for objType, objCount in unitCounter.items():
-            unitArr.append([objType.__name__, objCount])
+        self._originalCounts = self._counts.copy()
+        self._originalTotals = self._totals()
+        unitArr = self._granularUnitTable()
         self.oldTable = unitArr
         self.oldTableOriginal = unitArr.copy()
 
-    def _loadUnitStrengths(self, unitProfiles: pd.DataFrame):
+    def _loadUnitStrengths(self, unitProfiles: "UnitProfile | pd.DataFrame"):
         """Use the given profile to define the combat strengths of each unit type."""
-        for index, row in unitProfiles.iterrows():
-            # It's critical that the index values of the data frame match the int value in the Units enum
-            # Load the unit's strength
-            unitType = unitDict[Units(row["Key"])]
-            strengths = []
-            for vals in (row["Attack"], row["Defense"]):
-                strengthVals = [int(x) for x in str.split(vals, comboSeparator)]
-                strengths.append(strengthVals)
-            strengthTup = tuple(strengths)
-            # Leaving this horrid nested list comprehension for posterity
-            # strengthTup = tuple([[int(x) for x in str.split(vals,comboSeparator)] for vals in (
-            #     row["Attack"], row["Defense"])])
-            self.unitStrengths[unitType] = strengthTup
-
+        if not isinstance(unitProfiles, UnitProfile):
+            unitProfiles = UnitProfile.fromRows(unitProfiles.to_dict("records"))
+        for unitEnum, strengths in unitProfiles.strengths.items():
+            unitType = unitDict[unitEnum]
+            self.unitStrengths[unitType] = strengths
             # Load the unit's cost
-            self.unitCosts[unitType] = int(row["Cost"])
+            self.unitCosts[unitType] = unitProfiles.costs[unitEnum]
 
     # def _loadTechs(self):
     #     if Tech.SuperSubs in self.Techs:
@@ -157,128 +192,150 @@ class UnitCollection:
     #         self.unitStrengths[Units.Submarine] = (attack, defense)
     #         print(self.unitStrengths[Units.Submarine])
 
-    def _loadUnits(self, unitList: pd.DataFrame):
-        """Use the given unit series to populate the collection with units."""
+    def _loadUnits(self, unitList: "UnitCounts | pd.DataFrame"):
+        """Use the given unit counts (or Key/count data frame) to populate the collection with units."""
+        if isinstance(unitList, UnitCounts):
+            for unitEnum, unitCount in unitList.items():
+                self._addUnit(unitDict[unitEnum], unitCount)
+            return
         for index, row in unitList.iterrows():
             # Convert the int index to a Unit enum value, then get the type from the dictionary
             unitType = unitDict[Units(row["Key"])]
-            for i in range(row.iloc[1]):
-                self._addUnit(unitType)
+            if row.iloc[1] > 0:
+                self._addUnit(unitType, int(row.iloc[1]))
 
     # endregion
 
     # region Private helper functions
-    def _unitTypeInList(self, unitType):
-        return any(type(unit) == unitType for unit in self._unitList)
-
     def _unitInstanceInList(self, unitType):
-        return any(isinstance(unit, unitType) for unit in self._unitList)
+        return any(u in self._counts for u in _instanceTypes(unitType))
 
     def _removeUnitType(self, unitType, removeCount=1):
-        """Remove n units of the specified type from the unit list.
+        """Remove n units of the specified type from the collection.
         Returns the number of units removed."""
-        oldCount = len(self._unitList)
-        self._unitList = list(
-            filterfalse(
-                lambda u, counter=count(): type(u) == unitType
-                and next(counter) < removeCount,
-                self._unitList,
-            )
-        )
-        newCount = len(self._unitList)
-        return oldCount - newCount
+        return self._removeUnits(unitEnumDict[unitType], removeCount)
 
     def _removeUnitInstance(self, unitType, removeCount=1):
-        """Remove n units of the specified instance from the unit list.
+        """Remove n units of the specified instance from the collection.
         Returns the number of units removed."""
-        oldCount = len(self._unitList)
-        self._unitList = list(
-            filterfalse(
-                lambda u, counter=count(): isinstance(u, unitType)
-                and next(counter) < removeCount,
-                self._unitList,
-            )
-        )
-        newCount = len(self._unitList)
-        return oldCount - newCount
+        removed = 0
+        for u in _instanceTypes(unitType):
+            removed += self._removeUnits(u, removeCount - removed)
+            if removed == removeCount:
+                break
+        return removed
+
+    def _removeUnits(self, unitEnum, removeCount=1):
+        removed = self._counts.remove(unitEnum, removeCount)
+        self._updateTotals(unitEnum, -removed)
+        return removed
 
     def _countUnitTypeInList(self, unitType):
-        return len([x for x in self._unitList if type(x) == unitType])
-
-    def _addUnit(self, unitType):
-        self._unitList.append(self._makeUnit(unitType))
+        return self._counts.count(unitEnumDict[unitType])
+
+    def _addUnit(self, unitType, unitCount=1):
+        self._prototype(unitType)  # Fail early if the profile doesn't define the unit
+        self._counts.add(unitEnumDict[unitType], unitCount)
+        self._updateTotals(unitEnumDict[unitType], unitCount)
+
+    def _clearUnits(self):
+        self._counts.clear()
+        self._hp = 0
+        self._cost = 0
+        self._attackOutcomes = 0
+        self._defenseOutcomes = 0
+        self._granularCounts.clear()
+
+    def _totals(self):
+        return (self._hp, self._cost, self._attackOutcomes, self._defenseOutcomes, self._granularCounts.copy())
+
+    def _updateTotals(self, unitEnum, unitCount):
+        """Account for unitCount units of the given type being added (or removed, if negative)."""
+        hp, cost, attackOutcomes, defenseOutcomes, granularUnits = self._unitTotals[unitEnum]
+        self._hp += hp * unitCount
+        self._cost += cost * unitCount
+        self._attackOutcomes += attackOutcomes * unitCount
+        self._defenseOutcomes += defenseOutcomes * unitCount
+        for granularType, granularCount in granularUnits:
+            self._granularCounts.add(granularType, granularCount * unitCount)
 
     def _makeUnit(self, unitType):
+        Profiling.count("Units Instantiated")
         unit = unitType(self.unitStrengths[unitType], self.Techs)
         unit.cost = self.unitCosts[unitType]
         return unit
 
-    def _makeComboUnits(self):
-        # TODO: Wrap this in conditional so only advanced mech inf powers get it
-        if Tech.AdvancedMechInfantry in self.Techs:
-            while self._unitTypeInList(MechInfantry) and self._unitTypeInList(Tank):
-                if self._removeUnitType(Tank) == 0:
-                    raise Exception("No tank removed when it should have been")
-                if self._removeUnitType(MechInfantry) == 0:
-                    raise Exception(
-                        "No mechanized infantry removed when it should have been"
-                    )
-                self._addUnit(MechInfTank)
-
-        # Inf & Art
-        while (
-            self._unitTypeInList(Infantry) or self._unitTypeInList(MechInfantry)
-        ) and self._unitTypeInList(Artillery):
-            if self._removeUnitType(Artillery) == 0:
-                raise Exception("No artillery removed when it should have been")
-            if self._removeUnitType(MechInfantry) == 1:
-                self._addUnit(MechInfArt)
-                continue
-            if self._removeUnitType(Infantry) == 1:
-                self._addUnit(InfArt)
-                continue
-            raise Exception("No infantry removed when it should have been")
-
-        if Tech.AdvancedArtillery in self.Techs:
-            while (
-                self._unitTypeInList(Infantry) or self._unitTypeInList(MechInfantry)
-            ) and (self._unitTypeInList(InfArt) or self._unitTypeInList(MechInfArt)):
-                if self._removeUnitType(MechInfArt) == 1:
-                    if self._removeUnitType(MechInfantry) == 1:
-                        self._addUnit(MechInfArt2)
-                        continue
-                    if self._removeUnitType(Infantry) == 1:
-                        self._addUnit(InfMechInfArt)
-                        continue
-                elif self._removeUnitType(InfArt) == 1:
-                    if self._removeUnitType(MechInfantry) == 1:
-                        self._addUnit(InfMechInfArt)
-                        continue
-                    if self._removeUnitType(Infantry) == 1:
-                        self._addUnit(InfArt2)
-                        continue
-                raise Exception("Error building advanced artillery support")
-
-        # Tactical bomber combined arms
-        while self._unitTypeInList(TacticalBomber) and (
-            self._unitTypeInList(Fighter) or self._unitTypeInList(Tank)
-        ):
-            if self._removeUnitType(TacticalBomber) == 0:
-                raise Exception("No tactical bomber removed when it should have been")
-            if self._removeUnitType(Fighter) == 1:
-                self._addUnit(FighterTactBomber)
-                continue
-            if self._removeUnitType(Tank) == 1:
-                self._addUnit(TankTactBomber)
-                continue
-            raise Exception("No fighter/tank removed when it should have been")
-        while self._countUnitTypeInList(Conscript) > 1:
-            if self._removeUnitType(Conscript, 2) != 2:
-                raise Exception("Error while creating conscript combo units")
-            self._addUnit(ConscriptPair)
+    def _prototype(self, unitType):
+        """Shared unit instance that holds the strengths and cost of every unit of the given type."""
+        if unitType not in self._prototypes:
+            self._prototypes[unitType] = self._makeUnit(unitType)
+            granularUnits = self._granularUnits(unitType)
+            granularCounts = Counter(unitEnumDict[type(u)] for u in granularUnits)
+            self._unitTotals[unitEnumDict[unitType]] = (
+                sum(u.HP for u in granularUnits),
+                self.unitCosts[unitType],
+                self._hitOutcomes(unitType, True),
+                self._hitOutcomes(unitType, False),
+                list(granularCounts.items()),
+            )
+        return self._prototypes[unitType]
 
-    def _getGranularUnitList(self):
+    def _unitTypes(self):
+        """(unit class, count) pairs for every unit type in the collection."""
+        return [(unitDict[u], c) for u, c in self._counts.items()]
+
+    def _unitTypesByCost(self):
+        return sorted(self._unitTypes(), key=lambda t: self.unitCosts[t[0]])
+
+    @property
+    def _unitList(self):
+        """One unit object per unit in the collection, sorted by cost. The collection only
+        stores counts, so this is a freshly built snapshot and changes to it are not kept."""
         unitList = []
+        for unitType, unitCount in self._unitTypes():
+            unitList.extend(self._makeUnit(unitType) for i in range(unitCount))
+        unitList.sort()
+        return unitList
+
+    def _makeComboUnits(self):
+        """Pair up units into combined arms units. The number of pairs is computed from the unit counts,
+        in the same precedence order the units were previously paired one at a time. Existing combo units
+        are left alone, so after a casualty only the freed up unit is re-paired."""
+        with Profiling.phase("Combo Pairing"):
+            if Tech.AdvancedMechInfantry in self.Techs:
+                self._pairUnits(MechInfantry, Tank, MechInfTank)
+
+            # Inf & Art (mechanized infantry is supported first)
+            self._pairUnits(Artillery, MechInfantry, MechInfArt)
+            self._pairUnits(Artillery, Infantry, InfArt)
+
+            if Tech.AdvancedArtillery in self.Techs:
+                self._pairUnits(MechInfArt, MechInfantry, MechInfArt2)
+                self._pairUnits(MechInfArt, Infantry, InfMechInfArt)
+                self._pairUnits(InfArt, MechInfantry, InfMechInfArt)
+                self._pairUnits(InfArt, Infantry, InfArt2)
+
+            # Tactical bomber combined arms (fighters are paired first)
+            self._pairUnits(TacticalBomber, Fighter, FighterTactBomber)
+            self._pairUnits(TacticalBomber, Tank, TankTactBomber)
+
+            pairCount = self._countUnitTypeInList(Conscript) // 2
+            if pairCount > 0:
+                self._removeUnitType(Conscript, 2 * pairCount)
+                self._addUnit(ConscriptPair, pairCount)
+                Profiling.count("Combo Units Formed", pairCount)
+
+    def _pairUnits(self, firstType, secondType, comboType):
+        """Combine as many firstType/secondType pairs as possible into comboType units."""
+        pairCount = min(self._countUnitTypeInList(firstType), self._countUnitTypeInList(secondType))
+        if pairCount > 0:
+            self._removeUnitType(firstType, pairCount)
+            self._removeUnitType(secondType, pairCount)
+            self._addUnit(comboType, pairCount)
+            Profiling.count("Combo Units Formed", pairCount)
+
+    def _granularUnits(self, unitType):
+        """The non-combo units a single unit of the given type is made of."""
 
         # recursive function to break up combo units into non-combo units
         def breakUpComboUnit(unit):
@@ -286,30 +343,64 @@ class UnitCollection:
                 return [unit]
             units = []
             for t in unit.priority:
-                subUnit = self._makeUnit(t)
+                subUnit = self._prototype(t)
                 units.extend(breakUpComboUnit(subUnit))
             return units
 
-        for u in self._unitList:
-            if (
-                isinstance(u, ComboUnit)
-                and not isinstance(u, Battleship)
-                and not isinstance(u, Carrier)
-            ):
-                unitList.extend(breakUpComboUnit(u))
-            else:
-                unitList.append(u)
+        u = self._prototype(unitType)
+        if (
+            isinstance(u, ComboUnit)
+            and not isinstance(u, Battleship)
+            and not isinstance(u, Carrier)
+        ):
+            return breakUpComboUnit(u)
+        return [u]
+
+    def _getGranularUnitList(self):
+        """One (shared prototype) unit per granular unit in the collection. This is the slow path,
+        the granular unit counts are kept up to date in _granularCounts."""
+        unitList = []
+        for unitType, unitCount in self._unitTypes():
+            unitList.extend(self._granularUnits(unitType) * unitCount)
         unitList.sort()
         return unitList
 
+    def _granularUnitTable(self):
+        """["Unit", "Count"] table of the granular units in the collection, sorted by cost."""
+        unitArr = [["Unit", "Count"]]
+        granularTypes = sorted(self._granularCounts.items(), key=lambda t: self.unitCosts[unitDict[t[0]]])
+        for unitEnum, unitCount in granularTypes:
+            unitArr.append([unitDict[unitEnum].__name__, unitCount])
+        return unitArr
+
+    def _checkTotals(self):
+        """Cross-check the cached totals against the slow path (see Config.CHECK_CACHED_TOTALS)."""
+        unitList = self._getGranularUnitList()
+        granularCounts = UnitCounts()
+        for u in unitList:
+            granularCounts.add(unitEnumDict[type(u)])
+        slowTotals = (
+            sum(u.HP for u in unitList),
+            sum(c * self.unitCosts[t] for t, c in self._unitTypes()),
+            sum(c * self._hitOutcomes(t, True) for t, c in self._unitTypes()),
+            sum(c * self._hitOutcomes(t, False) for t, c in self._unitTypes()),
+            granularCounts,
+        )
+        if self._totals() != slowTotals:
+            raise AssertionError(
+                f"Cached collection totals are out of date: HP {self._hp}, cost {self._cost}, "
+                f"hit outcomes {self._attackOutcomes}/{self._defenseOutcomes}, units [{self._granularCounts}] "
+                f"(expected HP {slowTotals[0]}, cost {slowTotals[1]}, hit outcomes {slowTotals[2]}/{slowTotals[3]}, "
+                f"units [{slowTotals[4]}])"
+            )
+
     # endregion
 
     # region Magic methods
 
     def __str__(self):
         collStr = "Units in collection: " + str(self.currHP()) + "\n"
-        unitCount = Counter(type(obj) for obj in self._unitList)
-        for objType, objCount in unitCount.items():
+        for objType, objCount in self._unitTypesByCost():
             collStr += objType.__name__ + ": " + str(objCount) + "\n"
         return collStr + "\n"
 
@@ -318,7 +409,10 @@ class UnitCollection:
     # region Collection modification functions
 
     def reset(self):
-        self._unitList = self._originalUnitList.copy()
+        self._counts = self._originalCounts.copy()
+        self._hp, self._cost, self._attackOutcomes, self._defenseOutcomes, granularCounts = self._originalTotals
+        self._granularCounts = granularCounts.copy()
+        self._firstStruck.clear()
         self._lossPriority = self._originalLossPriority.copy()
         self.oldTable = self.oldTableOriginal.copy()
 
@@ -331,29 +425,28 @@ class UnitCollection:
     # region Printing Functions
 
     def PrintCollection(self):
+        from tabulate import tabulate
+
         # print(f"Unit Count: {self.currHP()}")
-        self._unitList.sort()
-        unitCounter = Counter(type(obj) for obj in self._unitList)
         unitArr = [["Unit", "Count"]]
-        for objType, objCount in unitCounter.items():
+        for objType, objCount in self._unitTypesByCost():
             unitArr.append([objType.__name__, objCount])
         print(tabulate(unitArr, headers="firstrow", tablefmt="fancy_grid"))
 
     def PrintGranularCollection(self):
-        unitList = self._getGranularUnitList()
-        unitCounter = Counter(type(obj) for obj in unitList)
-        unitArr = [["Unit", "Count"]]
-        for objType, objCount in unitCounter.items():
-            unitArr.append([objType.__name__, objCount])
+        from tabulate import tabulate
+
+        unitArr = self._granularUnitTable()
         print(tabulate(unitArr, headers="firstrow", tablefmt="fancy_grid"))
 
     def PrintCollectionComparison(self):
-        self._unitList.sort()
+        import pandas as pd
+        from tabulate import tabulate
+
+        # This is just to keep pandas from complaining
+        pd.set_option("future.no_silent_downcasting", True)
         # print(f"Current HP: {self.currHP()}")
-        unitCounter = Counter(type(obj) for obj in self._getGranularUnitList())
-        unitArr = [["Unit", "Count"]]
-        for objType, objCount in unitCounter.items():
-            unitArr.append([objType.__name__, objCount])
+        unitArr = self._granularUnitTable()
         df1 = self._unitStrArrToDf(self.oldTable)
         df2 = self._unitStrArrToDf(unitArr)
         df3 = self._unitStrArrToDf(self.oldTableOriginal)
@@ -395,6 +488,8 @@ class UnitCollection:
         self.oldTable = unitArr
 
     def _unitStrArrToDf(self, arr):
+        import pandas as pd
+
         indexes = [x[0] for x in arr[1:]]
         headers = ["Count"]
         count = [x[1] for x in arr[1:]]
@@ -444,33 +539,45 @@ class UnitCollection:
         return stats
 
     def currHP(self):
-        return sum([x.HP for x in self._getGranularUnitList()])
+        if Config.CHECK_CACHED_TOTALS:
+            self._checkTotals()
+        return self._hp
 
     def unitCount(self):
         unitCount = 0
-        for u in self._unitList:
-            unitCount += len(u.attackStrength)
+        for unitType, count in self._unitTypes():
+            unitCount += count * len(self._prototype(unitType).attackStrength)
         return unitCount
 
     def currCost(self):
-        totalCost = 0
-        for u in self._unitList:
-            totalCost += u.cost
-        return totalCost
+        if Config.CHECK_CACHED_TOTALS:
+            self._checkTotals()
+        return self._cost
+
+    def _hitOutcomes(self, unitType, isAttack=True):
+        """Hitting outcomes (see Dice.hitOutcomes) summed over the dice a single unit of the given type rolls."""
+        unit = self._prototype(unitType)
+        if not isinstance(unit, CombatUnit):
+            return 0
+        strengthVals = unit.attackStrength if isAttack else unit.defenseStrength
+        return sum(hitOutcomes(strength, unit.advantage) for strength in strengthVals)
 
     def expectedHits(self, isAttack=True):
-        if len(self._unitList) > 0:
-            dice = [u.unitHitDie(isAttack) for u in self._unitList]
-            return sum(dice).mean()
-        else:
-            return H({0: Config.DICE_SIZE}).mean()
-
-    def expectedCurve(self, attack=True) -> H:
-        if len(self._unitList) > 0:
-            dice = [u.unitHitDie(attack) for u in self._unitList]
-            return sum(dice)
-        else:
-            return H({0: Config.DICE_SIZE})
+        if Config.CHECK_CACHED_TOTALS:
+            self._checkTotals()
+        outcomes = self._attackOutcomes if isAttack else self._defenseOutcomes
+        return outcomes / Config.DICE_SIZE**2
+
+    def expectedCurve(self, attack=True) -> np.ndarray:
+        """Distribution of the number of hits scored in a round (entry k is the probability of k hits)."""
+        diceByProbability = Counter()
+        for unitType, count in self._unitTypes():
+            unit = self._prototype(unitType)
+            if not isinstance(unit, CombatUnit):
+                continue
+            for strength in unit.attackStrength if attack else unit.defenseStrength:
+                diceByProbability[hitProbability(strength, unit.advantage)] += count
+        return hitDistribution(np.array(list(diceByProbability.values())), np.array(list(diceByProbability.keys())))
 
     def hitsPerIpc(self, attack=True):
         hits = self.expectedHits(attack)
@@ -478,7 +585,8 @@ class UnitCollection:
         return hits / cost * 10
 
     def collectionEndurance(self, attack=True):
-        startingStrength = self.expectedHits(attack)
+        curve = self._lossCurve(attack)
+        startingUnitCount, startingCost, _, startingStrength = curve[0]
         if startingStrength == 0:
             rv = {
                 "endurance": "N/A",
@@ -490,42 +598,49 @@ class UnitCollection:
                 "Lost / Unit": "N/A",
             }
             return rv
-        startingUnitCount = self.currHP()
-        startingCost = self.currCost()
+        # The collection lasts until it's destroyed or down to half of its starting strength
         halfStrength = 0.5 * startingStrength
-        currStrength = startingStrength
-        placeholderUnit = CombatUnit((0, 0))
-        while len(self._unitList) > 0 and currStrength > halfStrength:
-            self.takeLosses([Hit(placeholderUnit)])
-            currStrength = self.expectedHits(attack)
-        endurance = startingUnitCount - self.currHP()
+        currHP, remainingValue, remainingUnits, _ = next(
+            state for state in curve if state[2] == 0 or state[3] <= halfStrength
+        )
+        endurance = startingUnitCount - currHP
         enduranceRatio = float(endurance) / startingUnitCount
-        remainingValue = self.currCost()
         lostValue = startingCost - remainingValue
         relLostValue = float(lostValue) / startingCost
         costPerLostUnit = float(lostValue) / endurance
         rv = {
             "endurance": endurance,
             "enduranceRatio": f"{enduranceRatio:.1%}",
-            "remainingUnits": len(self._unitList),
+            "remainingUnits": remainingUnits,
             "lostValue": lostValue,
             "remainingValue": remainingValue,
             "% Value Lost": f"{relLostValue:.1%}",
             "Lost / Unit": f"{costPerLostUnit:.2f}",
         }
-        self.reset()
         return rv
 
     def generateHitCurve(self, isAttack=True):
-        placeholderUnit = CombatUnit((0, 0))
-        curveList = []
-        originalHP = self.currHP()
-        while len(self._unitList) > 0:
-            curveList.append([self.currHP(), self.expectedHits(isAttack)])
-            self.takeLosses([Hit(placeholderUnit)])
+        """Expected hits of the collection after every HP lost, as a ["HP Lost", "Expected Hits"] data frame."""
+        import pandas as pd
+
+        curve = self._lossCurve(isAttack)
+        originalHP = curve[0][0]
+        curveList = [[originalHP - hp, hits] for hp, _, unitCount, hits in curve if unitCount > 0]
         df = pd.DataFrame(curveList, columns=["HP Lost", "Expected Hits"])
         return df
 
+    def _lossCurve(self, isAttack=True):
+        """Walk the loss priority once, one casualty at a time, from the current state until the
+        collection is destroyed. Returns one (HP, cost, unit count, expected hits) tuple per state;
+        the totals are kept up to date as units are removed, so each step only costs the casualty.
+        The collection is reset afterwards."""
+        curve = [(self._hp, self._cost, self._counts.total(), self.expectedHits(isAttack))]
+        while self._counts.total() > 0:
+            self.takeLosses(HitCounts.general(1))
+            curve.append((self._hp, self._cost, self._counts.total(), self.expectedHits(isAttack)))
+        self.reset()
+        return curve
+
     def valueDelta(self):
         return self.currCost() - self.originalCost
 
@@ -533,97 +648,114 @@ class UnitCollection:
 
     # region Combat functions
 
-    def attack(self):
-        hits = []
-        for u in self._unitList:
-            success = u.attack()
-            if success > 0:
-                hits.extend(self._generateHit(u, success))
-        return hits
+    def attack(self, rollObserver=None, rng: DiceRoller = None):
+        return self._generalCombat(True, rollObserver, rng)
 
-    def firstStrikeAttack(self, opponent):
-        hits = []
-        for u in [x for x in self._unitList if isinstance(x, FirstStrikeUnit)]:
-            success = u._firstStrikeAttack(opponent)
-            if success > 0:
-                hits.extend(self._generateHit(u, success))
-        return hits
+    def firstStrikeAttack(self, opponent, rollObserver=None, rng: DiceRoller = None):
+        return self._firstStrikeCombat(opponent, True, rollObserver, rng)
 
-    def defend(self):
-        hits = []
-        for u in self._unitList:
-            success = u.defend()
-            if success > 0:
-                hits.extend(self._generateHit(u, success))
-        return hits
+    def defend(self, rollObserver=None, rng: DiceRoller = None):
+        return self._generalCombat(False, rollObserver, rng)
+
+    def firstStrikeDefend(self, opponent, rollObserver=None, rng: DiceRoller = None):
+        return self._firstStrikeCombat(opponent, False, rollObserver, rng)
 
-    def firstStrikeDefend(self, opponent):
-        hits = []
-        for u in [x for x in self._unitList if isinstance(x, FirstStrikeUnit)]:
-            success = u._firstStrikeDefense(opponent)
-            if success > 0:
-                hits.extend(self._generateHit(u, success))
+    def _generalCombat(self, isAttack, rollObserver=None, rng: DiceRoller = None):
+        hits = HitCounts()
+        hasDestroyer = self._unitInstanceInList(Destroyer)
+        for unitType, unitCount in self._unitTypes():
+            unit = self._prototype(unitType)
+            if not isinstance(unit, CombatUnit):
+                continue
+            # Units that rolled in the first strike phase sit out the general combat phase
+            unitCount -= min(unitCount, self._firstStruck.count(unitEnumDict[unitType]))
+            if unitCount == 0:
+                continue
+            strength = unit.attackStrength if isAttack else unit.defenseStrength
+            success = unit._rollHits(strength, unitCount, rollObserver, rng)
+            hits.add(self._hitCategory(unitType, hasDestroyer), success)
+        self._firstStruck.clear()
         return hits
 
-    def _generateHit(self, unit: CombatUnit, hitNumber):
-        hits = []
-        for i in range(hitNumber):
-            hit = Hit(unit)
-            # Air vs Sub
-            if isinstance(unit, AirUnit) and self._unitInstanceInList(Destroyer):
-                hit.Immune.remove(Submarine)
-            hits.append(hit)
+    def _firstStrikeCombat(self, opponent, isAttack, rollObserver=None, rng: DiceRoller = None):
+        hits = HitCounts()
+        hasDestroyer = self._unitInstanceInList(Destroyer)
+        for unitType, unitCount in self._unitTypes():
+            if not issubclass(unitType, FirstStrikeUnit):
+                continue
+            unit = self._prototype(unitType)
+            if unit.isCountered(opponent):
+                continue
+            self._firstStruck.set(unitEnumDict[unitType], unitCount)
+            strength = unit.attackStrength if isAttack else unit.defenseStrength
+            success = unit._rollHits(strength, unitCount, rollObserver, rng)
+            hits.add(self._hitCategory(unitType, hasDestroyer), success)
         return hits
 
-    def takeLosses(self, hitList):
-        leftOver = []
-        hitList.sort()
-        for hit in hitList:
-            if len(self._unitList) == 0:
-                break  # All units killed, no need to apply further hits
-            for unitType in self._lossPriority:
-                removed = 0
-                if self._unitTypeInList(unitType) and hit.UnitTypeIsValidTarget(
-                    unitType
-                ):
-                    removed = self._removeUnitType(unitType, 1)
-                    if removed > 0 and issubclass(unitType, ComboUnit):
-                        self._correctComboUnits(unitType)
-                        self._makeComboUnits()
-                if removed > 0:
-                    break  # hit was applied, we can break out of the loop
-            if removed == 0:
-                # Hit wasn't applied (for whatever reason, likely a bug, or the unit list is empty)
-                leftOver.append(hit)
-
-        if len(leftOver) > 0:
-            print(
-                f"{bcolors.RED}ERROR: Units exist outside of the loss priority{
-                  bcolors.ENDC}"
-            )
-            print(leftOver)
-            hitList = []  # just keep track of hits that couldn't be applied at all
-            for hit in leftOver:
-                if len(self._unitList) == 0:
-                    break
-                removedUnit = self._applyHit(hit)
-                if removedUnit == None:
-                    hitList.append(hit)
-                if removedUnit != None and isinstance(removedUnit, ComboUnit):
-                    self._correctComboUnits(type(removedUnit))
-            if len(hitList) > 0:
-                print(
-                    f"{bcolors.RED}ERROR: Some hits could not be applied{
-                      bcolors.ENDC}"
-                )
-                print(hitList)
+    def _hitCategory(self, unitType, hasDestroyer):
+        category = _unitHitCategories[unitEnumDict[unitType]]
+        # Air vs Sub
+        if category == HitCategory.Air and hasDestroyer:
+            return HitCategory.General
+        return category
+
+    def takeLosses(self, hits: HitCounts, lossPriority=None):
+        """Apply the hits following the loss priority (or the given unit type order, see CasualtyPolicy).
+        Hits are applied one category at a time (submarine hits, then air hits, then general hits, see
+        HitCategory). Units missing from the loss priority take the hits that are left over after it, in
+        unit order. Hits without a valid target left (e.g., submarine hits when only air units are left)
+        are lost; returns the number of hits that could not be applied."""
+        lossPriority = self._lossPriority if lossPriority is None else lossPriority
+        unapplied = 0
+        for category, hitCount in hits.items():
+            hitCount = self._applyHits(_casualtyPlan(lossPriority, category), hitCount)
+            if hitCount > 0 and self._hasTarget(category):
+                # Valid targets are left, but they're missing from the loss priority
+                hitCount = self._applyHits(_casualtyPlan(_fallbackPriority, category), hitCount)
+            unapplied += hitCount
+        return unapplied
+
+    def _hasTarget(self, category: HitCategory):
+        targets = validTargets[category.value]
+        return any(targets[unitEnum.value] for unitEnum, unitCount in self._counts.items())
+
+    def canHit(self, opponent: "UnitCollection", isAttack=True):
+        """Does the collection have a unit that can score a hit the opponent can take (i.e., a unit
+        with a chance to hit whose hit category has a valid target among the opponent's units)?"""
+        hasDestroyer = self._unitInstanceInList(Destroyer)
+        for unitType, unitCount in self._unitTypes():
+            unit = self._prototype(unitType)
+            if not isinstance(unit, CombatUnit):
+                continue
+            strength = unit.attackStrength if isAttack else unit.defenseStrength
+            if max(strength) > 0 and opponent._hasTarget(self._hitCategory(unitType, hasDestroyer)):
+                return True
+        return False
+
+    def _applyHits(self, plan, hitCount):
+        """Apply hitCount hits to the unit types of the casualty plan, in order.
+        Returns the number of hits that could not be applied."""
+        i = 0
+        while hitCount > 0 and i < len(plan):
+            unitEnum = plan[i]
+            if unitEnum not in self._counts:
+                i += 1
+            elif unitEnum in _comboUnitTypes:
+                # Losing part of a combo unit frees up the rest of it, which may be re-paired
+                # into a unit type earlier in the plan, so start over after each casualty
+                self._removeUnits(unitEnum)
+                self._correctComboUnits(unitDict[unitEnum])
+                hitCount -= 1
+                i = 0
+            else:
+                hitCount -= self._removeUnits(unitEnum, hitCount)
+        return hitCount
 
     def CanFirstStrike(self, opponent):
         canDo = False
         if self._unitInstanceInList(FirstStrikeUnit):
             canDo = True
-        # any(isinstance(unit, unitType) for unit in self._unitList)
-        if all(isinstance(unit,FirstStrikeUnit) and unit.isCountered(opponent) for unit in self._unitList):
+        if all(issubclass(unitType, FirstStrikeUnit) and self._prototype(unitType).isCountered(opponent) for unitType, _ in self._unitTypes()):
             canDo = False
         return canDo
 
@@ -631,22 +763,12 @@ class UnitCollection:
         self._addUnit(comboType.priority[0])
         self._makeComboUnits()
 
-    def _applyHit(self, hit: Hit):
-        """Applies the hit with no regard for loss priority"""
-        unit = next((x for x in self._unitList if hit.UnitIsValidTarget(x)), None)
-        if unit != None:
-            self._unitList.remove(unit)
-        return unit
-
     def generateUnitDict(self, isLand: bool = True):
         rv = {}
         isNaval = not isLand
-        # Need to
-        unitList = self._getGranularUnitList()
-        unitCounter = Counter(type(obj) for obj in unitList)
         _unitDict = {}
-        for objType, objCount in unitCounter.items():
-            _unitDict[objType.__name__] = objCount
+        for unitEnum, unitCount in self._granularCounts.items():
+            _unitDict[unitDict[unitEnum].__name__] = unitCount
         if isLand:
             rv["conscript"] = _unitDict["Conscript"] if "Conscript" in _unitDict.keys() else 0
             rv["aaGun"] = _unitDict["AAA"] if "AAA" in _unitDict.keys() else 0
@@ -671,45 +793,23 @@ class UnitCollection:
         return rv
 
     def reloadUnitsFromDict(self, newUnits: dict[str:int]):
-        oldList = self._unitList
-        self._unitList = []
+        # First strike results are tracked per unit type (see _firstStruck), so they carry over to the new units
+        self._clearUnits()
         for key, value in newUnits.items():
-            for i in range(value):
-                self._addUnit(unitDict[UnitUIMap[key]])
+            if value > 0:
+                self._addUnit(unitDict[UnitUIMap[key]], value)
         self._makeComboUnits()
 
-        # Do something incredibly hacky to preserve first strike results
-        # Loop through the old list, and for each first strike unit that did strike, find a corresponding
-        # unit in the new list and set the didFirstStrike property to True
-        for unit in oldList:
-            if isinstance(unit, FirstStrikeUnit) and unit.didFirstStrike:
-                for newUnit in self._unitList:
-                    if type(newUnit) == type(unit) and not newUnit.didFirstStrike:
-                        newUnit.didFirstStrike = True
-                        break
-        oldList.clear()
-
 # endregion
 
 
 if __name__ == "__main__":
-    profileName = "Original_d6"
-    unitListsFile = "unitLists.csv"
-    listName = "Attacker"
-    profile = pd.read_csv(
-        f"UnitProfiles_{profileName}.csv", encoding="utf-8", delimiter=","
-    )
-    unitList = pd.read_csv(unitListsFile, encoding="utf-8", delimiter=",")
-    units = UnitCollection(unitList[listName], profile)
-    
+    import Registry
+
+    units = UnitCollection(Registry.getUnitList("Attacker"), Registry.getProfile("Original_d6"))
+
     # units.generateHitCurve()
 
-    profileName = "Original_d6"
-    unitListsFile = "unitLists.csv"
-    listName = "Defender"
-    profile = pd.read_csv(
-        f'UnitProfiles_{profileName}.csv', encoding='utf-8', delimiter=",")
-    unitList = pd.read_csv(unitListsFile, encoding='utf-8', delimiter=",")
-    units = UnitCollection(unitList[listName], profile)
+    units = UnitCollection(Registry.getUnitList("Defender"), Registry.getProfile("Original_d6"))
 
 
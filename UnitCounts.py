@@ -0,0 +1,57 @@
+from UnitsEnum import Units
+
+
+class UnitCounts:
+    """Fixed-length array of unit counts indexed by the Units enum value."""
+
+    __slots__ = ("_counts",)
+
+    def __init__(self, counts: list[int] = None):
+        self._counts = list(counts) if counts is not None else [0] * len(Units)
+
+    def add(self, unit: Units, count=1):
+        self._counts[unit.value] += count
+
+    def remove(self, unit: Units, count=1):
+        """Remove up to count units of the given type. Returns the number of units removed."""
+        removed = min(count, self._counts[unit.value])
+        self._counts[unit.value] -= removed
+        return removed
+
+    def count(self, unit: Units):
+        return self._counts[unit.value]
+
+    def set(self, unit: Units, count: int):
+        self._counts[unit.value] = count
+
+    def total(self):
+        return sum(self._counts)
+
+    def items(self):
+        """(unit, count) pairs for every unit type that is present."""
+        return [(Units(i), c) for i, c in enumerate(self._counts) if c > 0]
+
+    def asList(self):
+        return self._counts.copy()
+
+    def copy(self):
+        return UnitCounts(self._counts)
+
+    def clear(self):
+        self._counts = [0] * len(Units)
+
+    def __contains__(self, unit: Units):
+        return self._counts[unit.value] > 0
+
+    def __eq__(self, other):
+        return isinstance(other, UnitCounts) and self._counts == other._counts
+
+    def key(self):
+        """Hashable snapshot of the counts (e.g., for memoization)."""
+        return tuple(self._counts)
+
+    def __len__(self):
+        return self.total()
+
+    def __str__(self):
+        return ", ".join(f"{unit.name}: {count}" for unit, count in self.items())
@@ -1,14 +1,14 @@
-import random
 from time import sleep
-from dyce import H
 from TechMapping import Tech
-from tqdm import tqdm
 import sys
 from colorama import Style
 from colorama import Back
 from colorama import Fore
 from colorama import init as colorama_init
 from Config import Config
+from Dice import DiceRoller, defaultRoller
+from collections import Counter
+import numpy as np
 
 class UFmt:
     attHead = f"{Back.RED}{Style.BRIGHT}{Fore.WHITE}"
@@ -56,6 +56,14 @@ class Unit:
         return f'|{bar}| {roll} / {strength}'
 
 
+def printRolls(unit: Unit, rolls, strength):
+    """Roll observer (see CombatUnit._rollHits) that prints every die with a bar visualising the roll."""
+    for x in rolls.tolist():
+        sys.stdout.write(f"{f"{unit.__class__.__name__}:":<15} {Unit._getRollStr(x,strength)} {"HIT" if x <= strength else ""}\n")
+        sys.stdout.flush()
+        sleep(Config.ROLL_DELAY_MS / 1000)
+
+
 class LandUnit(Unit):
     pass
 
@@ -77,34 +85,28 @@ class CombatUnit(Unit):
         super().__init__(tech)
         self.attackStrength, self.defenseStrength = strengthArr
         self.didFirstStrike = False
-        self._setValidTargets()
         self.applyTech()
 
-    def _setValidTargets(self):
-        """All special unit hit restrictions are defined here, rather than in the specific classes."""
-        self.ValidTargets = [Unit]
-        self.ImmuneTargets = []
-        if isinstance(self, AirUnit):
-            self.ImmuneTargets.extend([Submarine])
-        if isinstance(self, Submarine):
-            self.ValidTargets = [NavalUnit]
-
-    def _makeRolls(self, rollValues):
+    def _makeRolls(self, rollValues, rollObserver=None, rng: DiceRoller = None):
         """Equivalent of _makeRoll for non-Combo units"""
+        return self._rollHits(rollValues, 1, rollObserver, rng)
+
+    def _rollHits(self, strengthVals, unitCount, rollObserver=None, rng: DiceRoller = None):
+        """Roll the dice of unitCount units with the given strengths and return the number of hits.
+        The dice of each strength are rolled in one draw; the rollObserver (e.g., printRolls) is
+        called with every draw."""
+        rng = defaultRoller if rng is None else rng
         hits = 0
-        for value in rollValues:
-            x = random.randint(1, Config.DICE_SIZE)
-            if self.advantage:
-                x = min(x,random.randint(1, Config.DICE_SIZE))
-            hits += 1 if x <= value else 0
-            sys.stdout.write(f"{f"{self.__class__.__name__}:":<15} {Unit._getRollStr(x,value)} {"HIT" if x <= value else ""}\n")
-            sys.stdout.flush()
-            sleep(Config.ROLL_DELAY_MS / 1000)
+        for strength, count in Counter(strengthVals).items():
+            rolls = rng.roll(count * unitCount, self.advantage)
+            hits += int(np.count_nonzero(rolls <= strength))
+            if rollObserver is not None:
+                rollObserver(self, rolls, strength)
         return hits
 
-    def _doStandardCombat(self, strength):
+    def _doStandardCombat(self, strength, rollObserver=None, rng: DiceRoller = None):
         if not self._madeFirstStrike():
-            return self._makeRolls(strength)
+            return self._makeRolls(strength, rollObserver, rng)
         else:
             return 0
 
@@ -113,34 +115,13 @@ class CombatUnit(Unit):
         self.didFirstStrike = False
         return didFirstStrike
 
-    def attack(self):
+    def attack(self, rollObserver=None, rng: DiceRoller = None):
         """Make an attack roll using the units attack strength."""
-        return self._doStandardCombat(self.attackStrength)
+        return self._doStandardCombat(self.attackStrength, rollObserver, rng)
 
-    def defend(self):
+    def defend(self, rollObserver=None, rng: DiceRoller = None):
         """Make a defense roll using the units defense strength."""
-        return self._doStandardCombat(self.defenseStrength)
-
-    def unitHitDie(self, isAttack=True):
-        """Returns a die (i.e., histogram) of potential outcomes of a combat roll."""
-        die = H(Config.DICE_SIZE)
-        if isAttack:
-            strengthVals = self.attackStrength
-        else:
-            strengthVals = self.defenseStrength
-
-        # Create a hit die for each unit in the combination
-        dice = []
-        for strength in strengthVals:
-            if strength > 0:
-                hitDie = H({
-                    1: die.le(strength)[1],
-                    0: die.ge(strength + 1)[1]
-                })
-            else:
-                hitDie = H({0: Config.DICE_SIZE})
-            dice.append(hitDie)
-        return sum(dice)
+        return self._doStandardCombat(self.defenseStrength, rollObserver, rng)
 
     def applyTech(self):
         """Virtual function used to apply techs that modify combat strength (e.g., Super Subs)"""
@@ -166,18 +147,18 @@ class FirstStrikeUnit(CombatUnit):
                 return True
         return False
 
-    def _doFirstStrikeCombat(self, strength, opponent):
+    def _doFirstStrikeCombat(self, strength, opponent, rollObserver=None, rng: DiceRoller = None):
         if self.isCountered(opponent):
             return 0
 
         self.didFirstStrike = True
-        return self._makeRolls(strength)
+        return self._makeRolls(strength, rollObserver, rng)
 
-    def _firstStrikeAttack(self, opponent):
-        return self._doFirstStrikeCombat(self.attackStrength, opponent)
+    def _firstStrikeAttack(self, opponent, rollObserver=None, rng: DiceRoller = None):
+        return self._doFirstStrikeCombat(self.attackStrength, opponent, rollObserver, rng)
 
-    def _firstStrikeDefense(self, opponent):
-        return self._doFirstStrikeCombat(self.defenseStrength, opponent)
+    def _firstStrikeDefense(self, opponent, rollObserver=None, rng: DiceRoller = None):
+        return self._doFirstStrikeCombat(self.defenseStrength, opponent, rollObserver, rng)
 
 
 class Infantry(CombatUnit, LandUnit):
@@ -237,8 +218,6 @@ class SurfaceShip(NavalUnit):
 class Submarine(FirstStrikeUnit, NavalUnit):
     def __init__(self, strengthArr, tech:list[Tech] = []):
         super().__init__(strengthArr, tech)
-        # TODO: Figure out where to make this definition. Currently double defined
-        self.ValidTargets = [NavalUnit]
         self._counterUnits.append(Destroyer)
 
     def applyTech(self):